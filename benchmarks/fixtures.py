@@ -0,0 +1,69 @@
+import random
+from html import escape
+
+from parsing_scheme import ScraperConfigSchema
+
+
+# same markup classes as the magnit catalog
+CATALOG_CONFIG = ScraperConfigSchema(
+    main_class='article',
+    main_link='unit-catalog-product-preview show-ratings',
+    name_class='div',
+    name_link='pl-text unit-catalog-product-preview-title',
+    cost_class='span',
+    cost_link='pl-text unit-catalog-product-preview-prices__regular'
+)
+
+BRANDS = ['Burn', 'Adrenaline Rush', 'Red Bull', 'Gorilla', 'Tornado', 'Flash Up', 'Monster', 'Lit Energy',
+          'Drive Me', 'Volt', 'Jaguar', 'E-ON', 'Revo', 'Black Monster', 'Genesis']
+FLAVOURS = ['Original', 'Яблоко-Киви', 'Манго', 'Тропик', 'Без сахара', 'Ягодный', 'Кокос', 'Лайм', 'Вишня', 'Цитрус']
+VOLUMES = ['0,25л', '0,33л', '0,449л', '0,45л', '0,5л', '1л']
+
+
+def product_names(count: int, seed: int = 1) -> list[str]:
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        names.add(f"Энергетический напиток {rng.choice(BRANDS)} {rng.choice(FLAVOURS)} "
+                  f"{rng.choice(VOLUMES)} #{rng.randrange(10000)}")
+    return sorted(names)
+
+
+def product_card(name: str, cost: int) -> str:
+    # a trimmed copy of a real card: pictures, ratings and badges around the two fields we read
+    return (
+        '<article class="unit-catalog-product-preview show-ratings">'
+        '<a class="pl-hover-base" href="/product/1"><div class="unit-catalog-product-preview-image">'
+        '<picture><source type="image/webp" srcset="/img.webp"><img src="/img.jpg" alt=""></picture></div>'
+        '<div class="unit-catalog-product-preview-rating"><span class="pl-text">4.8</span></div>'
+        '<div class="unit-catalog-product-preview-prices">'
+        f'<span class="pl-text unit-catalog-product-preview-prices__regular">Цена {cost},99 ₽</span>'
+        '<span class="pl-text unit-catalog-product-preview-prices__sale">-10%</span></div>'
+        f'<div class="pl-text unit-catalog-product-preview-title">{escape(name)}</div>'
+        '<div class="unit-catalog-product-preview-unit-value">шт</div></a>'
+        '<button class="pl-button" type="button"><span class="pl-button__icon"></span></button>'
+        '</article>'
+    )
+
+
+def catalog_page(names: list[str], costs: dict[str, int]) -> str:
+    cards = "".join(product_card(name, costs[name]) for name in names)
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8"><title>Энергетические напитки</title>'
+        + '<script>window.__NUXT__={};</script>' * 20
+        + '</head><body><header class="header"><nav>' + '<a href="/catalog">Каталог</a>' * 50 + '</nav></header>'
+        '<main><div class="unit-catalog__list">' + cards + '</div></main>'
+        '<footer>' + '<p class="pl-text">Магнит</p>' * 30 + '</footer></body></html>'
+    )
+
+
+def catalog_pages(names: list[str], costs: dict[str, int], page_size: int = 48) -> list[str]:
+    return [catalog_page(names[start:start + page_size], costs) for start in range(0, len(names), page_size)]
+
+
+def daily_costs(names: list[str], day: int, seed: int = 1) -> dict[str, int]:
+    # prices move rarely, like real ones: about 3% of products change on a given day
+    rng = random.Random(seed)
+    base = {name: rng.randrange(49, 250) for name in names}
+    rng = random.Random(seed * 1000 + day)
+    return {name: cost + (rng.randrange(-10, 11) if rng.random() < 0.03 else 0) for name, cost in base.items()}
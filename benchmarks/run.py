@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from botconfig import DBConfig, load_config
+from catalog import catalog
+from database import configure_engine, dispose_engine, get_session, get_session_pool
+from parsing import ShopScraper
+from parsing_scheme import ConnectionParamsSchema
+from result_cache import query_cache
+from search import create_search_index
+from structures import Base
+from telbot import get_plot_data, get_products_cost, get_products_name
+
+from benchmarks.fixtures import CATALOG_CONFIG, catalog_pages, daily_costs, product_names
+
+
+logger = logging.getLogger("benchmarks")
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+NAME_TERMS = ['burn', 'red bull', 'манго', 'без сахара', 'нер', 'monster яблоко', '0,5л', 'lit energy']
+COST_TERMS = list(range(50, 260, 15))
+
+
+# the scraper writes under utc_date instead of today, so history can be laid down day by day
+class FixtureScraper(ShopScraper):
+    def _get_current_date(self) -> date:
+        return self.utc_date
+
+
+def make_scraper(link: str, backend: str, history_mode: str, update_date: date) -> FixtureScraper:
+    return FixtureScraper(
+        shop_name='Магнит',
+        link=link,
+        connection_params=ConnectionParamsSchema(),
+        scraper_config=CATALOG_CONFIG,
+        website_method='static',
+        parser_backend=backend,
+        history_mode=history_mode,
+        utc_date=update_date
+    )
+
+
+# stand-in for the shop: serves the recorded pages and an empty page past the last one
+async def start_catalog_server(pages: list[str]) -> tuple[web.AppRunner, str]:
+    async def catalog_page(request: web.Request) -> web.Response:
+        page = int(request.query.get('page', 1))
+        text = pages[page - 1] if 1 <= page <= len(pages) else "<html><body></body></html>"
+        return web.Response(text=text, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/catalog', catalog_page)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/catalog?page=1"
+
+
+async def measure(repeat: int, func: Callable[[], Awaitable], setup: Optional[Callable] = None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            await setup()
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return {'median': statistics.median(samples), 'min': min(samples), 'repeat': repeat}
+
+
+async def _no_caches() -> None:
+    query_cache.invalidate()
+
+
+def _timed_days(days: int, repeat: int) -> set[int]:
+    # the last `repeat` seeded days are the timed writes, into an already populated table
+    return set(range(max(days - repeat, 0), days))
+
+
+async def run_suite(args: argparse.Namespace) -> dict:
+    today = date.today()
+    names = product_names(args.catalog)
+    results = {}
+
+    async with get_session_pool()() as session:
+        connection = await session.connection()
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(create_search_index)
+        await session.commit()
+
+    # pure functions first, no I/O involved
+    prices = [f"Цена {cost},99 ₽" for cost in range(args.catalog)]
+
+    async def clean_prices():
+        for price in prices:
+            ShopScraper._clean_price(price)
+    results['clean_price'] = await measure(args.repeat, clean_prices)
+
+    pages = catalog_pages(names, daily_costs(names, 0))
+    for backend in ('lxml', 'bs4'):
+        scraper = make_scraper('http://localhost/catalog', backend, args.history, today)
+
+        async def parse_pages(scraper=scraper):
+            for page in pages:
+                await scraper._parse_content(page, write=False)
+        results[f'parse_content[{backend}]'] = await measure(args.repeat, parse_pages)
+
+    # history: one full catalog per day, the most recent days are timed
+    timed = _timed_days(args.days - 1, args.repeat)
+    write_samples = []
+    for day in range(args.days - 1):
+        update_date = today - timedelta(days=args.days - 1 - day)
+        costs = daily_costs(names, day)
+        scraper = make_scraper('http://localhost/catalog', args.parser_backend, args.history, update_date)
+        started = time.perf_counter()
+        await scraper._update_database([(name, costs[name]) for name in names])
+        if day in timed:
+            write_samples.append(time.perf_counter() - started)
+    if write_samples:
+        results['db_write'] = {'median': statistics.median(write_samples), 'min': min(write_samples),
+                               'repeat': len(write_samples)}
+
+    # today's catalog goes through the whole scrape: HTTP, parsing, page cache and writes
+    today_pages = catalog_pages(names, daily_costs(names, args.days - 1))
+    runner, link = await start_catalog_server(today_pages)
+    try:
+        async def scrape():
+            scraper = make_scraper(link, args.parser_backend, args.history, today)
+            await scraper._static_scrape(pages=len(today_pages) + 1)
+        results['scrape_static'] = await measure(args.repeat, scrape)
+    finally:
+        await runner.cleanup()
+
+    # bot queries, straight from the database and from the in-memory snapshot
+    plot_names = names[::max(len(names) // 20, 1)][:20]
+    for source in ('db', 'snapshot'):
+        if source == 'snapshot':
+            await catalog.refresh(get_session_pool())
+        else:
+            catalog.snapshot = None
+
+        async with get_session_pool()() as session:
+            async def by_name(session=session):
+                for term in NAME_TERMS:
+                    page, cursor = await get_products_name(session, term)
+                    if cursor:
+                        await get_products_name(session, term, cursor)
+
+            async def by_cost(session=session):
+                for cost in COST_TERMS:
+                    page, cursor = await get_products_cost(session, cost)
+                    if cursor:
+                        await get_products_cost(session, cost, cursor)
+
+            results[f'get_products_name[{source}]'] = await measure(args.repeat, by_name, _no_caches)
+            results[f'get_products_cost[{source}]'] = await measure(args.repeat, by_cost, _no_caches)
+
+    async with get_session_pool()() as session:
+        async def plot_data():
+            for name in plot_names:
+                dates, costs, _, _ = await get_plot_data(session, name)
+                assert len(dates) >= args.days - 1, f"{name}: {len(dates)} points"
+        results['get_plot_data'] = await measure(args.repeat, plot_data)
+
+    return results
+
+
+# timings only mean something if both backends read the same products, declared XHTML included
+async def check_parity(pages: list[str]) -> list[str]:
+    pages = pages + ['<?xml version="1.0" encoding="utf-8"?>\n' + page for page in pages]
+    rows = {}
+    for backend in ('lxml', 'bs4'):
+        scraper = make_scraper('http://localhost/catalog', backend, 'daily', date.today())
+        rows[backend] = []
+        for page in pages:
+            try:
+                rows[backend].append(await scraper._parse_content(page, write=False))
+            except Exception as e:
+                rows[backend].append(repr(e))
+    return [f"page {index + 1}: lxml {lxml_rows if isinstance(lxml_rows, str) else len(lxml_rows)}, "
+            f"bs4 {bs4_rows if isinstance(bs4_rows, str) else len(bs4_rows)}"
+            for index, (lxml_rows, bs4_rows) in enumerate(zip(rows['lxml'], rows['bs4'])) if lxml_rows != bs4_rows]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            continue
+        if result['median'] > reference * (1 + threshold):
+            regressions.append(f"{name}: {result['median'] * 1000:.2f} ms, "
+                               f"baseline {reference * 1000:.2f} ms ({result['median'] / reference - 1:+.0%})")
+    return regressions
+
+
+def report(results: dict, baseline: dict) -> None:
+    references = baseline.get('results', {})
+    for name, result in results.items():
+        line = f"{name:32} {result['median'] * 1000:10.2f} ms  (min {result['min'] * 1000:.2f} ms)"
+        if reference := references.get(name):
+            line += f"  {result['median'] / reference - 1:+.0%} vs baseline"
+        print(line)
+
+
+def database_config(args: argparse.Namespace, workdir: str) -> DBConfig:
+    if args.postgres:
+        # only the server and credentials come from .env, the database itself is a scratch one
+        config = load_config(os.path.join(ROOT, ".env")).db
+        config.name = args.postgres
+        return config
+    return DBConfig(host='', port=0, name=os.path.join(workdir, 'bench.sqlite3'), user='', password='',
+                    driver='sqlite+aiosqlite')
+
+
+async def main(args: argparse.Namespace) -> int:
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    params = {'catalog': args.catalog, 'days': args.days, 'history': args.history,
+              'database': 'postgresql' if args.postgres else 'sqlite'}
+    if baseline and baseline.get('params') != params:
+        logger.warning(f"Baseline was recorded with {baseline.get('params')}, not comparing.")
+        baseline = {}
+
+    names = product_names(args.catalog)
+    if mismatches := await check_parity(catalog_pages(names[:200], daily_costs(names, 0))):
+        print("lxml and bs4 disagree:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        return 1
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = configure_engine(database_config(args, workdir))
+        try:
+            results = await run_suite(args)
+        finally:
+            if args.postgres:
+                async with engine.begin() as connection:
+                    await connection.run_sync(Base.metadata.drop_all)
+            await dispose_engine()
+
+    report(results, baseline)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            'params': params,
+            'results': {name: result['median'] for name, result in results.items()}
+        }, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions := compare(results, baseline, args.threshold):
+        print(f"Regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline scraper and bot query benchmarks.")
+    parser.add_argument('--catalog', type=int, default=2000, help="products per day")
+    parser.add_argument('--days', type=int, default=60, help="days of price history")
+    parser.add_argument('--history', choices=('daily', 'intervals'), default='daily')
+    parser.add_argument('--parser-backend', default='auto')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--postgres', metavar='DB_NAME',
+                        help="run against this scratch PostgreSQL database (dropped afterwards) instead of SQLite")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.WARNING)
+    sys.exit(asyncio.run(main(parse_args())))
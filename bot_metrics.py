@@ -0,0 +1,166 @@
+import html
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from database import get_engine, pool_stats
+from query_metrics import query_metrics, track_db_time
+from result_cache import inline_cache, query_cache
+import scrape_metrics
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th observation, +Inf reported as the last bound
+        rank, seen = q * self.count, 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+
+# latency histograms keyed by (kind, name): handlers, their DB share, Telegram API methods, chart renders
+class BotMetrics:
+    def __init__(self):
+        self.histograms: dict[tuple[str, str], LatencyHistogram] = {}
+
+    def observe(self, kind: str, name: str, seconds: float) -> None:
+        histogram = self.histograms.get((kind, name))
+        if histogram is None:
+            histogram = self.histograms[(kind, name)] = LatencyHistogram()
+        histogram.observe(seconds)
+
+
+bot_metrics = BotMetrics()
+
+
+# inner middleware, the resolved handler is known here and its name labels the timings
+class HandlerLatencyMiddleware(BaseMiddleware):
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object is not None else type(event).__name__
+        started = time.perf_counter()
+        with track_db_time() as db_time:
+            try:
+                return await handler(event, data)
+            finally:
+                bot_metrics.observe('handler', name, time.perf_counter() - started)
+                bot_metrics.observe('handler_db', name, db_time[0])
+
+
+class ApiLatencyMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            bot_metrics.observe('api', type(method).__name__, time.perf_counter() - started)
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, help_text: str) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (kind, label), histogram in sorted(bot_metrics.histograms.items()):
+        labels = f'kind="{kind}",name="{_label(label)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.total}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def prometheus_text() -> str:
+    lines = _histogram_lines('bot_latency_seconds', 'Handler, handler DB, Telegram API and chart latency.')
+
+    lines += ["# HELP db_query_seconds Time spent in statements by fingerprint.", "# TYPE db_query_seconds summary"]
+    for key, stats in query_metrics.statements.items():
+        labels = f'statement="{_label(key[:200])}"'
+        lines.append(f'db_query_seconds_sum{{{labels}}} {stats.total}')
+        lines.append(f'db_query_seconds_count{{{labels}}} {stats.count}')
+    lines += ["# HELP db_slow_queries_total Statements over the slow query threshold.",
+              "# TYPE db_slow_queries_total counter"]
+    lines += [f'db_slow_queries_total{{statement="{_label(key[:200])}"}} {stats.slow}'
+              for key, stats in query_metrics.statements.items() if stats.slow]
+
+    for prefix, cache in (('query_cache', query_cache), ('inline_cache', inline_cache)):
+        for key, value in cache.stats().items():
+            if isinstance(value, (int, float)):
+                lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {value}"]
+    for key, value in pool_stats(get_engine()).items():
+        if isinstance(value, (int, float)):
+            lines += [f"# TYPE db_pool_{key} gauge", f"db_pool_{key} {value}"]
+
+    return "\n".join(lines) + "\n" + scrape_metrics.prometheus_text()
+
+
+def format_stats(limit: int = 10) -> str:
+    lines = ["Handlers (count, avg, p95, db avg):"]
+    for (kind, name), histogram in sorted(bot_metrics.histograms.items()):
+        if kind != 'handler' or not histogram.count:
+            continue
+        db = bot_metrics.histograms.get(('handler_db', name))
+        db_avg = db.total / db.count * 1000 if db and db.count else 0.0
+        lines.append(f"  {name}: {histogram.count}, {histogram.total / histogram.count * 1000:.0f} ms, "
+                     f"<{histogram.quantile(0.95) * 1000:.0f} ms, {db_avg:.1f} ms")
+
+    lines.append("Telegram API and charts (count, avg):")
+    for (kind, name), histogram in sorted(bot_metrics.histograms.items()):
+        if kind in ('api', 'chart') and histogram.count:
+            lines.append(f"  {kind} {name}: {histogram.count}, {histogram.total / histogram.count * 1000:.0f} ms")
+
+    lines.append("Queries by total time (count, avg, max, slow):")
+    for key, stats in query_metrics.top(limit):
+        lines.append(f"  {stats.count}, {stats.total / stats.count * 1000:.1f} ms, {stats.max * 1000:.1f} ms, "
+                     f"{stats.slow}: {key[:120]}")
+
+    lines.append(f"Result cache: {query_cache.stats()}")
+    lines.append(f"Inline cache: {inline_cache.stats()}")
+    lines.append(f"DB pool: {pool_stats(get_engine())}")
+    return "<pre>" + html.escape("\n".join(lines)) + "</pre>"
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=prometheus_text(), content_type='text/plain', charset='utf-8')
+
+
+# every process serves its own counters; with several webhook workers each scrape hits one of them
+async def start_metrics_server(host: str, port: int, reuse_port: bool = False) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port, reuse_port=reuse_port or None).start()
+    logger.info(f"Metrics served on {host}:{port}/metrics")
+    return runner
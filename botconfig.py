@@ -1,10 +1,19 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from environs import Env
 
 @dataclass
 class TgBot:
     token: str
     admin_ids: list[int]
+    mode: str = 'polling'
+    fsm_storage: str = 'memory'
+    webhook_url: str = ''
+    webhook_path: str = '/webhook'
+    webhook_secret: str = ''
+    host: str = '127.0.0.1'
+    port: int = 8080
+    workers: int = 1
+    metrics_port: int = 0
 
 @dataclass
 class DBConfig:
@@ -13,26 +22,86 @@ class DBConfig:
     name: str
     user: str
     password: str
+    driver: str = 'postgresql+asyncpg'
+    pool_size: int = 5
+    max_overflow: int = 5
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 256
+    echo: bool = False
+    slow_query_ms: float = 200.0
+
+@dataclass
+class ScrapeConfig:
+    interval: float = 21600.0
+    jitter: float = 600.0
+    on_start: bool = True
+    processes: int = 0
+    watch_interval: float = 60.0
 
 @dataclass
 class Config:
     tg_bot: TgBot
     db: DBConfig
+    scrape: ScrapeConfig = field(default_factory=ScrapeConfig)
 
-def load_config(path: str | None) -> Config:
+def _read_env(path: str | None) -> Env:
     env = Env()
     env.read_env(path)
+    return env
 
-    return Config(
-    tg_bot=TgBot(
-        token=env('BOT_TOKEN'),
-        admin_ids=list(map(int, env.list('ADMIN_IDS')))
-    ),
-    db=DBConfig(
+def _db_config(env: Env) -> DBConfig:
+    return DBConfig(
         host=env('DB_HOST'),
         port=env('DB_PORT'),
         name=env('DB_NAME'),
         user=env('DB_USER'),
-        password=env('DB_PASSWORD')
+        password=env('DB_PASSWORD'),
+        driver=env('DB_DRIVER', 'postgresql+asyncpg'),
+        pool_size=env.int('DB_POOL_SIZE', 5),
+        max_overflow=env.int('DB_MAX_OVERFLOW', 5),
+        pool_timeout=env.float('DB_POOL_TIMEOUT', 30.0),
+        pool_recycle=env.int('DB_POOL_RECYCLE', 1800),
+        pool_pre_ping=env.bool('DB_POOL_PRE_PING', True),
+        statement_cache_size=env.int('DB_STATEMENT_CACHE_SIZE', 256),
+        echo=env.bool('DB_ECHO', False),
+        slow_query_ms=env.float('DB_SLOW_QUERY_MS', 200.0)
+    )
+
+def _scrape_config(env: Env) -> ScrapeConfig:
+    return ScrapeConfig(
+        interval=env.float('SCRAPE_INTERVAL', 21600.0),
+        jitter=env.float('SCRAPE_JITTER', 600.0),
+        on_start=env.bool('SCRAPE_ON_START', True),
+        processes=env.int('SCRAPE_PROCESSES', 0),
+        watch_interval=env.float('CATALOG_WATCH_INTERVAL', 60.0)
     )
+
+# the scraper alone needs no bot token, it only reads the sections it uses
+def load_db_config(path: str | None) -> DBConfig:
+    return _db_config(_read_env(path))
+
+def load_scrape_config(path: str | None) -> ScrapeConfig:
+    return _scrape_config(_read_env(path))
+
+def load_config(path: str | None) -> Config:
+    env = _read_env(path)
+
+    return Config(
+    tg_bot=TgBot(
+        token=env('BOT_TOKEN'),
+        admin_ids=list(map(int, env.list('ADMIN_IDS'))),
+        mode=env('BOT_MODE', 'polling'),
+        fsm_storage=env('BOT_FSM_STORAGE', 'memory'),
+        webhook_url=env('WEBHOOK_URL', ''),
+        webhook_path=env('WEBHOOK_PATH', '/webhook'),
+        webhook_secret=env('WEBHOOK_SECRET', ''),
+        host=env('WEBHOOK_HOST', '127.0.0.1'),
+        port=env.int('WEBHOOK_PORT', 8080),
+        workers=env.int('WEBHOOK_WORKERS', 1),
+        metrics_port=env.int('METRICS_PORT', 0)
+    ),
+    db=_db_config(env),
+    scrape=_scrape_config(env)
 )
@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import aclosing, nullcontext
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterable, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from fetching import HostLimiter, PageResult, fetch_window
+from parsing_scheme import ConnectionParamsSchema
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Playwright, Route
+
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'media'}
+BLOCKED_HOSTS = (
+    'mc.yandex.ru',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'top-fwz1.mail.ru',
+    'mindbox.ru',
+)
+
+
+async def _block_heavy_requests(route: "Route") -> None:
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# the shop's query params go after the page's own ones, the way aiohttp extends a URL with `params`
+def _with_params(url: str, params: dict[str, str]) -> str:
+    if not params:
+        return url
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list(params.items())
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+# long-lived headless Chromium shared by every dynamic scraper, pages are opened as tabs;
+# each shop gets its own contexts, so its cookies and headers pick the same store a static fetch would
+class BrowserPool:
+    def __init__(self, contexts: int = 2, max_tabs: int = 8, timeout: float = 30.0):
+        self.contexts = max(1, contexts)
+        self.max_tabs = max(1, max_tabs)
+        self.timeout = timeout
+        self._lock = asyncio.Lock()
+        self._tabs = asyncio.Semaphore(self.max_tabs)
+        self._playwright: Optional["Playwright"] = None
+        self._browser: Optional["Browser"] = None
+        self._contexts: dict[str, Iterator["BrowserContext"]] = {}
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._browser is not None:
+                return
+            # playwright is heavy to import, static-only runs and the bot never need it
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._browser is not None:
+                await self._browser.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+            self._browser = self._playwright = None
+            self._contexts = {}
+
+    async def _new_context(self, url: str, connection_params: ConnectionParamsSchema) -> "BrowserContext":
+        context = await self._browser.new_context(extra_http_headers=connection_params.headers)
+        if connection_params.cookies:
+            host = urlsplit(url).hostname
+            await context.add_cookies([{'name': name, 'value': value, 'domain': host, 'path': '/'}
+                                       for name, value in connection_params.cookies.items()])
+        await context.route("**/*", _block_heavy_requests)
+        return context
+
+    async def _next_context(self, url: str, connection_params: ConnectionParamsSchema) -> "BrowserContext":
+        key = connection_params.model_dump_json()
+        if key not in self._contexts:
+            async with self._lock:
+                if key not in self._contexts:
+                    contexts = [await self._new_context(url, connection_params) for _ in range(self.contexts)]
+                    self._contexts[key] = itertools.cycle(contexts)
+        return next(self._contexts[key])
+
+    # the limiter is the one static fetchers use, so dynamic shops count towards the same caps
+    async def fetch(self, url: str, limiter: Optional[HostLimiter] = None,
+                    on_request: Optional[Callable[[str], None]] = None,
+                    connection_params: Optional[ConnectionParamsSchema] = None) -> PageResult:
+        connection_params = connection_params or ConnectionParamsSchema()
+        await self.start()
+        async with self._tabs, (limiter.slot(url) if limiter is not None else nullcontext()):
+            page = None
+            started = time.perf_counter()
+            if on_request is not None:
+                on_request(url)
+            try:
+                context = await self._next_context(url, connection_params)
+                page = await context.new_page()
+                response = await page.goto(_with_params(url, connection_params.params),
+                                           wait_until='networkidle', timeout=self.timeout * 1000)
+                text = await page.content()
+                return PageResult(
+                    url=url,
+                    status=response.status if response else None,
+                    text=text,
+                    elapsed=time.perf_counter() - started,
+                    size=len(text.encode())
+                )
+            except Exception as e:
+                logger.error(f"Page load failed for {url}: {e!r}")
+                return PageResult(url=url, error=repr(e), elapsed=time.perf_counter() - started)
+            finally:
+                if page is not None:
+                    await page.close()
+
+    async def fetch_many(self, urls: Iterable[str], concurrency: int = 4, limiter: Optional[HostLimiter] = None,
+                         on_request: Optional[Callable[[str], None]] = None,
+                         connection_params: Optional[ConnectionParamsSchema] = None) -> AsyncIterator[PageResult]:
+        async def fetch(url: str) -> PageResult:
+            return await self.fetch(url, limiter, on_request, connection_params)
+
+        async with aclosing(fetch_window(fetch, urls, min(concurrency, self.max_tabs))) as results:
+            async for result in results:
+                yield result
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from result_cache import query_cache
+from structures import Product, Shop
+
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+
+
+@dataclass(frozen=True)
+class CatalogItem:
+    id: int
+    name: str
+    cost: int
+    shop: str
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+# immutable view of one day's catalog, replaced as a whole after each scrape
+class CatalogSnapshot:
+    def __init__(self, items: Iterable[CatalogItem], update_date: date):
+        self.update_date = update_date
+        self.items = sorted(items, key=lambda item: (item.cost, item.id))
+        self.costs = [item.cost for item in self.items]
+        self._keys = [(item.cost, item.id) for item in self.items]
+        self._names = [item.name.lower() for item in self.items]
+
+        self._index: dict[str, list[int]] = {}
+        for position, name in enumerate(self._names):
+            for gram in _ngrams(name):
+                self._index.setdefault(gram, []).append(position)
+
+        # sorted (word, position) pairs: a flat trie, every word prefix is a bisect range
+        self._words = sorted({(word, position) for position, name in enumerate(self._names)
+                              for word in name.split()})
+        self._word_keys = [word for word, _ in self._words]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    # both lookups return (key, item) pairs after the `after` key, keys are the pagination cursors
+    def by_cost(self, low: int, high: int, after: Optional[Sequence] = None,
+                limit: Optional[int] = None) -> list[tuple[tuple, CatalogItem]]:
+        start = bisect_left(self.costs, low)
+        if after is not None:
+            start = max(start, bisect_right(self._keys, tuple(after)))
+        end = bisect_right(self.costs, high)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [(self._keys[position], self.items[position]) for position in range(start, end)]
+
+    def by_name(self, term: str, after: Optional[Sequence] = None,
+                limit: Optional[int] = None) -> list[tuple[tuple, CatalogItem]]:
+        term = term.strip().lower()
+        if len(term) < NGRAM:
+            candidates = range(len(self.items))
+        else:
+            postings = sorted((self._index.get(gram, []) for gram in _ngrams(term)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+
+        # earliest match first, then shorter names, like a prefix search would
+        matches = [
+            ((self._names[position].find(term), len(self._names[position]), self.items[position].id), position)
+            for position in candidates
+            if term in self._names[position]
+        ]
+        if after is not None:
+            after = tuple(after)
+            matches = [match for match in matches if match[0] > after]
+        matches.sort()
+        return [(key, self.items[position]) for key, position in matches[:limit]]
+
+
+    # autocomplete: the last word is a prefix, earlier words must appear in the name
+    def complete(self, query: str, limit: int = 20) -> list[CatalogItem]:
+        words = query.lower().split()
+        if not words:
+            return []
+        *required, prefix = words
+
+        start = bisect_left(self._word_keys, prefix)
+        positions = set()
+        for index in range(start, len(self._words)):
+            word, position = self._words[index]
+            if not word.startswith(prefix):
+                break
+            positions.add(position)
+
+        names = self._names
+        matches = [position for position in positions if all(word in names[position] for word in required)]
+        matches.sort(key=lambda position: (not names[position].startswith(prefix), len(names[position]),
+                                           self.items[position].id))
+        return [self.items[position] for position in matches[:limit]]
+
+
+async def load_snapshot(session: AsyncSession, update_date: Optional[date] = None) -> CatalogSnapshot:
+    update_date = update_date or date.today()
+    result = await session.execute(
+        select(Product.id, Product.name, Product.cost, Shop.name)
+        .join(Shop, Shop.id == Product.shop_id)
+        .where(Product.update_date == update_date)
+    )
+    return CatalogSnapshot((CatalogItem(*row) for row in result.all()), update_date)
+
+
+# cheap summary of today's rows, changes whenever a scrape adds products or moves prices
+async def _catalog_stamp(session: AsyncSession) -> tuple:
+    result = await session.execute(
+        select(func.count(Product.id), func.max(Product.id), func.sum(Product.cost))
+        .where(Product.update_date == date.today())
+    )
+    return date.today(), *result.one()
+
+
+class CatalogHolder:
+    def __init__(self):
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.version = 0
+        self._stamp: Optional[tuple] = None
+
+    def today(self) -> Optional[CatalogSnapshot]:
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.update_date != date.today():
+            return None
+        return snapshot
+
+    async def refresh(self, session_pool: async_sessionmaker) -> CatalogSnapshot:
+        async with session_pool() as session:
+            snapshot = await load_snapshot(session)
+            self._stamp = await _catalog_stamp(session)
+        # a single assignment, readers see either the old or the new snapshot
+        self.snapshot = snapshot
+        self.version += 1
+        logger.info(f"Catalog snapshot for {snapshot.update_date} loaded: {len(snapshot)} products")
+        return snapshot
+
+    # for processes that don't run the scrapes themselves (webhook workers): reload once the data moved
+    async def watch(self, session_pool: async_sessionmaker, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_pool() as session:
+                    stamp = await _catalog_stamp(session)
+                if stamp != self._stamp:
+                    await self.refresh(session_pool)
+                    query_cache.invalidate()
+            except Exception as e:
+                logger.error(f"Catalog watch failed: {e}")
+
+
+catalog = CatalogHolder()
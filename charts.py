@@ -0,0 +1,96 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Hashable, Optional
+
+from aiogram.types import BufferedInputFile
+
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker() -> None:
+    # fonts and style are set up once per worker process, not per chart
+    import matplotlib
+    import matplotlib.style
+    matplotlib.use('Agg')
+    matplotlib.style.use('ggplot')
+    matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+
+
+def render_price_chart(dates: list, costs: list) -> bytes:
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    ax.plot(
+        dates,
+        costs,
+        marker='o',
+        linestyle='--',
+        color='#2c7be5',
+        linewidth=2,
+        markersize=8
+    )
+
+    ax.set_title("Динамика цен", fontsize=14, pad=20)
+    ax.set_xlabel("Дата", fontsize=12, labelpad=15)
+    ax.set_ylabel("Цена, RUB", fontsize=12, labelpad=15)
+
+    ax.grid(True, linestyle='--', alpha=0.3)
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
+    return buf.getvalue()
+
+
+# renders charts in worker processes and keeps the latest PNGs in an LRU cache
+class ChartService:
+    def __init__(self, workers: int = 2, cache_size: int = 256):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._cache: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the bot's loop already runs threads a forked worker could deadlock on
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def get_cached(self, key: Hashable) -> Optional[BufferedInputFile]:
+        png = self._cache.get(key)
+        if png is None:
+            return None
+        self._cache.move_to_end(key)
+        return BufferedInputFile(file=png, filename="price_trend.png")
+
+    # `key` should change whenever the data does, e.g. (product, shop, latest update_date)
+    async def render(self, key: Hashable, dates: list, costs: list) -> BufferedInputFile:
+        if cached := self.get_cached(key):
+            return cached
+
+        loop = asyncio.get_running_loop()
+        png = await loop.run_in_executor(self._get_executor(), render_price_chart, dates, costs)
+
+        self._cache[key] = png
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return BufferedInputFile(file=png, filename="price_trend.png")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_service = ChartService()
@@ -0,0 +1,162 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
+
+from sqlalchemy import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from botconfig import DBConfig, load_db_config
+from query_metrics import install_query_hooks
+from search import install_sqlite_functions
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def observe(self, wait: float, timed_out: bool = False) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.timeouts += timed_out
+
+
+# queue pool that records how long each checkout waited for a free connection
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.observe(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _url(config: DBConfig) -> URL:
+    if config.driver.startswith('sqlite'):
+        return URL.create(config.driver, database=config.name)
+    return URL.create(
+        config.driver,
+        username=config.user,
+        password=config.password,
+        host=config.host,
+        port=int(config.port),
+        database=config.name
+    )
+
+
+def create_engine(config: DBConfig) -> AsyncEngine:
+    url = _url(config)
+    if url.get_backend_name() == 'sqlite':
+        engine = create_async_engine(url, echo=config.echo)
+        install_sqlite_functions(engine)
+        install_query_hooks(engine, config.slow_query_ms / 1000)
+        return engine
+
+    connect_args = {}
+    if url.get_driver_name() == 'asyncpg':
+        url = url.update_query_dict({'prepared_statement_cache_size': str(config.statement_cache_size)})
+        connect_args['statement_cache_size'] = config.statement_cache_size
+
+    engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=config.pool_size,
+        max_overflow=config.max_overflow,
+        pool_timeout=config.pool_timeout,
+        pool_recycle=config.pool_recycle,
+        pool_pre_ping=config.pool_pre_ping,
+        connect_args=connect_args,
+        echo=config.echo
+    )
+    engine.pool.metrics = PoolMetrics()
+    install_query_hooks(engine, config.slow_query_ms / 1000)
+    return engine
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    stats = {'pool': pool.status()}
+    if not isinstance(pool, TimedQueuePool):
+        return stats
+
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    stats.update({
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+        'utilization': round(pool.checkedout() / capacity, 3) if capacity else None,
+    })
+    if metrics := pool.metrics:
+        stats.update({
+            'checkouts': metrics.checkouts,
+            'wait_avg_ms': round(metrics.wait_total / metrics.checkouts * 1000, 3) if metrics.checkouts else 0.0,
+            'wait_max_ms': round(metrics.wait_max * 1000, 3),
+            'timeouts': metrics.timeouts,
+        })
+    return stats
+
+
+_engine: Optional[AsyncEngine] = None
+_session_pool: Optional[async_sessionmaker] = None
+
+
+# one engine and pool per process, shared by the scraper and the bot
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_engine(load_db_config(".env"))
+    return _engine
+
+
+# replaces the process engine, e.g. with a throwaway database in benchmarks
+def configure_engine(config: DBConfig) -> AsyncEngine:
+    global _engine, _session_pool
+    _engine = create_engine(config)
+    _session_pool = None
+    return _engine
+
+
+def get_session_pool() -> async_sessionmaker:
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _session_pool
+
+
+# session factory with async context manager
+@asynccontextmanager
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_session_pool()() as session:
+        try:
+            async with session.begin():
+                yield session
+        except Exception as e:
+            logger.error(f"Database error: {e}", exc_info=True)
+            raise
+
+
+async def dispose_engine() -> None:
+    global _engine, _session_pool
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _session_pool = None
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import re
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import Optional
+
+from parsing_scheme import ScraperConfigSchema
+
+try:
+    import lxml.html
+    from lxml.etree import XPath
+except ImportError:  # lxml is optional, bs4 stays as the fallback
+    lxml = None
+
+
+logger = logging.getLogger(__name__)
+
+ExtractedRows = list[Optional[tuple[str, int]]]
+
+# lxml refuses str input that declares its own encoding, the text is already decoded anyway
+_xml_declaration = re.compile(r'^\ufeff?\s*<\?xml[^>]*\?>')
+
+
+def clean_price(price_str: str) -> int:
+    try:
+        return int(price_str.replace('Цена', '').split(".")[0].split(",")[0].strip())
+    except (ValueError, AttributeError):
+        return 0
+
+
+class BaseExtractor:
+    name = 'base'
+
+    def __init__(self, config: ScraperConfigSchema):
+        self.config = config
+
+    # one entry per product card, None for a card without a name
+    def extract(self, content: str) -> tuple[ExtractedRows, list[str]]:
+        raise NotImplementedError
+
+
+class Bs4Extractor(BaseExtractor):
+    name = 'bs4'
+
+    def extract(self, content: str) -> tuple[ExtractedRows, list[str]]:
+        from bs4 import BeautifulSoup  # only loaded when this backend is actually used
+
+        soup = BeautifulSoup(content, "html.parser")
+        elements = soup.find_all(self.config.main_class, class_=self.config.main_link)
+
+        rows, errors = [], []
+        for element in elements:
+            try:
+                name_element = element.find(self.config.name_class, class_=self.config.name_link)
+                if not name_element:
+                    rows.append(None)
+                    continue
+                cost_element = element.find(self.config.cost_class, class_=self.config.cost_link)
+                rows.append((
+                    name_element.text.strip(),
+                    clean_price(cost_element.text) if cost_element else 0
+                ))
+            except Exception as e:
+                logger.error(f"Element processing error: {e}", exc_info=True)
+                errors.append(str(e))
+                rows.append(None)
+        return rows, errors
+
+
+def _class_xpath(tag: str, class_value: str) -> str:
+    # same match rules as bs4's class_=: a single class matches any one of the element's classes,
+    # several classes only match the whole attribute, in that order
+    normalized = " ".join(class_value.split())
+    if " " in normalized:
+        return f"{tag}[normalize-space(@class)='{normalized}']"
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {normalized} ')]"
+
+
+class LxmlExtractor(BaseExtractor):
+    name = 'lxml'
+
+    def __init__(self, config: ScraperConfigSchema):
+        super().__init__(config)
+        self._cards = XPath("//" + _class_xpath(config.main_class, config.main_link))
+        self._name = XPath(".//" + _class_xpath(config.name_class, config.name_link))
+        self._cost = XPath(".//" + _class_xpath(config.cost_class, config.cost_link))
+
+    def extract(self, content: str) -> tuple[ExtractedRows, list[str]]:
+        if not content or not content.strip():
+            return [], []
+        tree = lxml.html.fromstring(_xml_declaration.sub('', content, count=1))
+
+        rows, errors = [], []
+        for element in self._cards(tree):
+            try:
+                name_elements = self._name(element)
+                if not name_elements:
+                    rows.append(None)
+                    continue
+                cost_elements = self._cost(element)
+                rows.append((
+                    name_elements[0].text_content().strip(),
+                    clean_price(cost_elements[0].text_content()) if cost_elements else 0
+                ))
+            except Exception as e:
+                logger.error(f"Element processing error: {e}", exc_info=True)
+                errors.append(str(e))
+                rows.append(None)
+        return rows, errors
+
+
+_backends = {
+    'bs4': Bs4Extractor,
+    'lxml': LxmlExtractor,
+}
+
+
+@lru_cache(maxsize=None)
+def _compile(backend: str, config_key: tuple) -> BaseExtractor:
+    config = ScraperConfigSchema(**dict(config_key))
+    return _backends[backend](config)
+
+
+# selectors are compiled once per (backend, config) and reused across pages
+def get_extractor(config: ScraperConfigSchema, backend: str = 'auto') -> BaseExtractor:
+    if backend == 'auto':
+        backend = 'lxml' if lxml is not None else 'bs4'
+    elif backend not in _backends:
+        raise ValueError(f"Unknown parser backend '{backend}'. Supported backends are {', '.join(_backends)}.")
+    elif backend == 'lxml' and lxml is None:
+        raise ValueError("Parser backend 'lxml' requires the lxml package.")
+    return _compile(backend, tuple(sorted(config.dict().items())))
+
+
+def _extract_page(backend: str, config_key: tuple, content: str) -> tuple[ExtractedRows, list[str]]:
+    # runs inside pool workers, so only plain tuples and strings cross the process boundary
+    try:
+        return _compile(backend, config_key).extract(content)
+    except Exception as e:
+        logger.error(f"Page parsing error: {e}", exc_info=True)
+        return [], [f"Page parsing error: {e}"]
+
+
+async def extract_async(config: ScraperConfigSchema, content: str, backend: str = 'auto',
+                        executor: Optional[Executor] = None) -> tuple[ExtractedRows, list[str]]:
+    extractor = get_extractor(config, backend)
+    if executor is None:
+        return extractor.extract(content)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _extract_page, extractor.name, tuple(sorted(config.dict().items())), content
+    )
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from parsing_scheme import ConnectionParamsSchema
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageResult:
+    url: str
+    status: Optional[int] = None
+    text: Optional[str] = None
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    elapsed: Optional[float] = None
+    size: int = 0
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+# fake_useragent loads its browser list on import, so it's only pulled in by the first fetcher;
+# one agent per process, like a single browser would be
+@lru_cache(maxsize=1)
+def random_user_agent() -> str:
+    from fake_useragent import UserAgent
+    return UserAgent().random
+
+
+# caps in-flight requests per host and overall, shared between scrapers
+class HostLimiter:
+    def __init__(self, per_host: int = 4, total: int = 16):
+        self.per_host = max(1, per_host)
+        self._total = asyncio.Semaphore(max(1, total))
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = urlsplit(url).netloc
+        host_semaphore = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with host_semaphore, self._total:
+            yield
+
+
+# one pooled keep-alive client per shop, at most `concurrency` pages in flight
+class PageFetcher:
+    def __init__(self, connection_params: ConnectionParamsSchema, concurrency: int = 4, timeout: float = 30.0,
+                 limiter: Optional[HostLimiter] = None):
+        self.connection_params = connection_params
+        self.limiter = limiter
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "PageFetcher":
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        headers = dict(self.connection_params.headers)
+        headers.setdefault('User-Agent', random_user_agent())
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            cookies=self.connection_params.cookies,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # `on_request` is called once a slot is held and the request really goes out
+    async def fetch(self, url: str, headers: Optional[dict[str, str]] = None,
+                    on_request: Optional[Callable[[str], None]] = None) -> PageResult:
+        if self._session is None:
+            raise RuntimeError("PageFetcher is not started, use 'async with'.")
+
+        async with self._semaphore:
+            if self.limiter is None:
+                return await self._get(url, headers, on_request)
+            async with self.limiter.slot(url):
+                return await self._get(url, headers, on_request)
+
+    async def _get(self, url: str, headers: Optional[dict[str, str]],
+                   on_request: Optional[Callable[[str], None]]) -> PageResult:
+        # latency is measured once a slot is held, queueing behind the limiter is not counted
+        started = time.perf_counter()
+        if on_request is not None:
+            on_request(url)
+        try:
+            async with self._session.get(url, params=self.connection_params.params, headers=headers) as response:
+                body = await response.read()
+                # a body that doesn't match its declared charset still yields a page, not an exception
+                return PageResult(
+                    url=url,
+                    status=response.status,
+                    text=body.decode(response.get_encoding(), errors='replace'),
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    elapsed=time.perf_counter() - started,
+                    size=len(body)
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Request failed for {url}: {e!r}")
+            return PageResult(url=url, error=repr(e), elapsed=time.perf_counter() - started)
+        except Exception as e:
+            # anything else (unknown charset, ...) stays with this page instead of ending the run
+            logger.error(f"Unexpected error fetching {url}: {e!r}", exc_info=True)
+            return PageResult(url=url, error=repr(e), elapsed=time.perf_counter() - started)
+
+    async def fetch_many(self, urls: Iterable[str], headers: Optional[Callable[[str], dict[str, str]]] = None,
+                         on_request: Optional[Callable[[str], None]] = None) -> AsyncIterator[PageResult]:
+        async def fetch(url: str) -> PageResult:
+            return await self.fetch(url, headers(url) if headers else None, on_request)
+
+        async with aclosing(fetch_window(fetch, urls, self.concurrency)) as results:
+            async for result in results:
+                yield result
+
+
+# keeps a window of requests running ahead, but yields strictly in input order
+async def fetch_window(fetch: Callable[[str], Awaitable[PageResult]], urls: Iterable[str],
+                       concurrency: int) -> AsyncIterator[PageResult]:
+    pending: list[asyncio.Task] = []
+    url_iter = iter(urls)
+    try:
+        for url in url_iter:
+            pending.append(asyncio.create_task(fetch(url)))
+            if len(pending) >= concurrency:
+                break
+
+        while pending:
+            result = await pending.pop(0)
+            next_url = next(url_iter, None)
+            if next_url is not None:
+                pending.append(asyncio.create_task(fetch(next_url)))
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,52 @@
+import logging
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from storage import get_insert
+from structures import FSMRecord
+
+
+logger = logging.getLogger(__name__)
+
+
+# FSM storage in the shared database, so any worker process can continue a dialog
+class SQLStorage(BaseStorage):
+    def __init__(self, session_pool: async_sessionmaker, key_builder: Optional[KeyBuilder] = None):
+        self.session_pool = session_pool
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    async def _upsert(self, key: StorageKey, **values: Any) -> None:
+        async with self.session_pool() as session:
+            insert = get_insert(session)
+            stmt = insert(FSMRecord).values(key=self.key_builder.build(key), **values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['key'],
+                set_={column: stmt.excluded[column] for column in values}
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _get(self, key: StorageKey) -> Optional[FSMRecord]:
+        async with self.session_pool() as session:
+            return await session.scalar(select(FSMRecord).filter_by(key=self.key_builder.build(key)))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._upsert(key, data=dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = await self._get(key)
+        return dict(record.data or {}) if record else {}
+
+    async def close(self) -> None:
+        pass
@@ -1,12 +1,8 @@
 from dataclasses import dataclass
-from fake_useragent import UserAgent
 from parsing import *
 from parsing_scheme import *
 
 
-ua = UserAgent().random
-
-
 cookies_magnit = {
     '_ym_uid': '1731567664913563808',
     '_ym_d': '1731567664',
@@ -42,7 +38,7 @@ headers_magnit = {
     'Sec-Fetch-Site': 'same-origin',
     'Sec-Fetch-User': '?1',
     'Upgrade-Insecure-Requests': '1',
-    'User-Agent': ua,
+    # 'User-Agent' is filled in by PageFetcher with a random one
     'sec-ch-ua': '"Microsoft Edge";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
     'sec-ch-ua-mobile': '?0',
     'sec-ch-ua-platform': '"Windows"',
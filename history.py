@@ -0,0 +1,108 @@
+import logging
+from datetime import date, timedelta
+from typing import Iterable, Sequence
+
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from structures import PriceInterval, Product
+
+
+logger = logging.getLogger(__name__)
+
+# names per IN (...) lookup, keeps SQLite under its bound variables limit
+LOOKUP_SIZE = 500
+
+
+async def _current_intervals(session: AsyncSession, shop_id: int, identity_ids: list[int],
+                             update_date: date) -> dict[int, PriceInterval]:
+    # only an interval seen yesterday or today can be continued
+    current = {}
+    for start in range(0, len(identity_ids), LOOKUP_SIZE):
+        result = await session.scalars(
+            select(PriceInterval).where(
+                PriceInterval.shop_id == shop_id,
+                PriceInterval.identity_id.in_(identity_ids[start:start + LOOKUP_SIZE]),
+                PriceInterval.valid_to >= update_date - timedelta(days=1)
+            )
+        )
+        for interval in result.all():
+            previous = current.get(interval.identity_id)
+            if previous is None or interval.valid_from > previous.valid_from:
+                current[interval.identity_id] = interval
+    return current
+
+
+# intervals are keyed by product identity, names that canonicalize alike share one
+async def record_price_intervals(session: AsyncSession, rows: Iterable[tuple[str, int]],
+                                 shop_id: int, update_date: date, identities: dict[str, int]) -> None:
+    prices = {identities[name]: (name, cost) for name, cost in rows}
+    if not prices:
+        return
+
+    current = await _current_intervals(session, shop_id, list(prices), update_date)
+    extend, new = [], []
+    for identity_id, (name, cost) in prices.items():
+        interval = current.get(identity_id)
+        if interval is None:
+            new.append(identity_id)
+        elif interval.cost == cost:
+            if interval.valid_to < update_date:
+                extend.append(interval.id)
+        elif interval.valid_from == update_date:
+            # price changed again within the same day, the last one wins
+            interval.cost = cost
+        else:
+            if interval.valid_to == update_date:
+                interval.valid_to = update_date - timedelta(days=1)
+            new.append(identity_id)
+
+    for start in range(0, len(extend), LOOKUP_SIZE):
+        await session.execute(
+            update(PriceInterval)
+            .where(PriceInterval.id.in_(extend[start:start + LOOKUP_SIZE]))
+            .values(valid_to=update_date)
+        )
+    session.add_all(
+        PriceInterval(name=prices[identity_id][0], cost=prices[identity_id][1], shop_id=shop_id,
+                      identity_id=identity_id, valid_from=update_date, valid_to=update_date)
+        for identity_id in new
+    )
+    await session.flush()
+
+
+# with intervals kept, products only has to hold the latest day for today's searches;
+# older daily rows go only once an interval covers them, so pre-interval history stays;
+# the latest row of each product is kept, name search (and so the chart) finds products
+# through it even after they left the catalog
+async def prune_daily_rows(session: AsyncSession, shop_id: int, before: date) -> None:
+    covered = exists().where(
+        PriceInterval.shop_id == Product.shop_id,
+        PriceInterval.identity_id == Product.identity_id,
+        PriceInterval.valid_from <= Product.update_date,
+        PriceInterval.valid_to >= Product.update_date
+    )
+    later = aliased(Product)
+    superseded = exists().where(
+        later.shop_id == Product.shop_id,
+        later.identity_id == Product.identity_id,
+        later.update_date > Product.update_date
+    )
+    await session.execute(
+        delete(Product).where(Product.shop_id == shop_id, Product.update_date < before, covered, superseded)
+    )
+
+
+# (valid_from, valid_to, cost, ...) rows back to one point per day; for a day
+# covered twice the earlier row wins, so pass interval rows before daily rows
+def expand_series(rows: Iterable[Sequence]) -> tuple[list[date], list[int]]:
+    daily: dict[date, int] = {}
+    for valid_from, valid_to, cost, *_ in rows:
+        day = valid_from
+        while day <= valid_to:
+            daily.setdefault(day, cost)
+            day += timedelta(days=1)
+
+    dates = sorted(daily)
+    return dates, [daily[day] for day in dates]
@@ -0,0 +1,96 @@
+import logging
+import re
+from typing import AsyncContextManager, Callable, Iterable
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from storage import get_insert
+from structures import PriceInterval, Product, ProductIdentity
+
+
+logger = logging.getLogger(__name__)
+
+# 2 bound columns per row on insert, one per name on lookup
+BATCH_SIZE = 400
+
+_volume = re.compile(r'(\d+(?:[.,]\d+)?)\s*(мл|ml|л|l)(?![^\W\d_])', re.IGNORECASE)
+_punctuation = re.compile(r'[^\w\s]|_')
+
+
+def _volume_to_ml(match: re.Match) -> str:
+    value = float(match[1].replace(',', '.'))
+    if match[2].lower() in ('л', 'l'):
+        value *= 1000
+    return f' {round(value)}ml '
+
+
+# 'Энергетик BURN 0,5л.' and 'энергетик burn 500 мл' are the same product
+def canonical_name(name: str) -> str:
+    text = name.lower().replace('ё', 'е')
+    text = _volume.sub(_volume_to_ml, text)
+    text = _punctuation.sub(' ', text)
+    return ' '.join(text.split())
+
+
+# process-wide canonical name -> id cache, new identities are created in their own transaction
+class IdentityRegistry:
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+
+    async def resolve(self, session_factory: Callable[[], AsyncContextManager[AsyncSession]],
+                      names: Iterable[str]) -> dict[str, int]:
+        canonical = {name: canonical_name(name) for name in set(names)}
+        missing = {}
+        for name, key in canonical.items():
+            if key not in self._ids:
+                missing.setdefault(key, name)
+
+        if missing:
+            keys = sorted(missing)
+            async with session_factory() as session:
+                insert = get_insert(session)
+                for start in range(0, len(keys), BATCH_SIZE):
+                    batch = keys[start:start + BATCH_SIZE]
+                    await session.execute(
+                        insert(ProductIdentity)
+                        .values([{'canonical': key, 'name': missing[key]} for key in batch])
+                        .on_conflict_do_nothing(index_elements=['canonical'])
+                    )
+                    result = await session.execute(
+                        select(ProductIdentity.canonical, ProductIdentity.id)
+                        .where(ProductIdentity.canonical.in_(batch))
+                    )
+                    self._ids.update(result.all())
+
+        return {name: self._ids[key] for name, key in canonical.items()}
+
+
+identity_registry = IdentityRegistry()
+
+
+# links rows written before product_identity existed, run once after an upgrade (run_scraper.py --backfill-identities)
+async def backfill_identities(session_factory: Callable[[], AsyncContextManager[AsyncSession]]) -> int:
+    linked = 0
+    for model in (Product, PriceInterval):
+        while True:
+            async with session_factory() as session:
+                result = await session.scalars(
+                    select(model.name).where(model.identity_id.is_(None)).distinct().limit(BATCH_SIZE)
+                )
+                names = result.all()
+            if not names:
+                break
+
+            identities = await identity_registry.resolve(session_factory, names)
+            async with session_factory() as session:
+                await session.execute(
+                    update(model.__table__)
+                    .where(model.__table__.c.name == bindparam('raw_name'), model.__table__.c.identity_id.is_(None))
+                    .values(identity_id=bindparam('new_identity_id')),
+                    [{'raw_name': name, 'new_identity_id': identity_id} for name, identity_id in identities.items()]
+                )
+            linked += len(identities)
+    if linked:
+        logger.info(f"Linked {linked} product names to identities")
+    return linked
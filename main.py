@@ -1,33 +1,28 @@
 import asyncio
-import sqlalchemy as db
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
-from structures import *
-import sqlite3
-import aiosqlite
-from headers import *
-from telbot import main_bot
 
-engine = create_async_engine(url='sqlite+aiosqlite:///db.enerkotik.sqlite3')
-async_session = async_sessionmaker(engine, class_=AsyncSession)
-conn = engine.connect()
-meta = db.MetaData()
+from botconfig import load_config
+from browser_pool import browser_pool
+from run_scraper import build_scheduler
+from schema import create_tables
+from telbot import main_bot, serve_webhook
 
-async def scrap():
-    debug_info = await magnit.scrape()
-    print(debug_info)
-    # debug_info = await perekrestok.scrape()
-    # print(debug_info)
-
-async def create_tables():
-    async with engine.begin() as connection:
-        await connection.run_sync(Base.metadata.create_all)
 
+# bot and scraper in one process; run_bot.py and run_scraper.py start either one alone
+# the bot comes up right away, scrapes run next to it on the scheduler's cadence
 async def main():
+    config = load_config(".env")
     await create_tables()
-    await scrap()
-    await main_bot()
+    scheduler = build_scheduler(config.scrape)
+    scheduler.start()
+    if config.tg_bot.mode == 'webhook':
+        try:
+            await asyncio.to_thread(serve_webhook)
+        finally:
+            await scheduler.stop()
+            await browser_pool.close()
+    else:
+        await main_bot(on_shutdown=(scheduler.stop, browser_pool.close))
 
 
 if __name__ == '__main__':
     asyncio.run(main())
-
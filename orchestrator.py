@@ -0,0 +1,57 @@
+import asyncio
+import copy
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from fetching import HostLimiter
+from parsing import ShopScraper
+from scrape_metrics import write_json_lines
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _timed_scrape(scraper: ShopScraper, limiter: HostLimiter,
+                        executor: Optional[Executor]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        debug_info = copy.deepcopy(await scraper.scrape(limiter=limiter, executor=executor))
+    except Exception as e:
+        logger.error(f"Scrape failed for {scraper.shop_name}: {e}", exc_info=True)
+        debug_info = copy.deepcopy(scraper.debug_info)
+        debug_info.setdefault('errors', []).append(str(e))
+    debug_info['elapsed'] = round(time.perf_counter() - started, 3)
+    return debug_info
+
+
+# runs all scrapers on one loop, wall time is set by the slowest shop;
+# with `processes` set, page parsing goes to a process pool and the loop keeps fetching;
+# with `metrics_path` set, per-page and per-run counters are appended there as JSON lines
+async def scrape_all(scrapers: Iterable[ShopScraper], per_host: int = 4, total: int = 16,
+                     processes: Optional[int] = None, metrics_path: Optional[str] = None) -> Dict[str, Any]:
+    scrapers = list(scrapers)
+    limiter = HostLimiter(per_host=per_host, total=total)
+    # spawn, not fork: the loop already runs aiohttp/aiosqlite threads a forked child could deadlock on
+    executor = None
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(_timed_scrape(scraper, limiter, executor) for scraper in scrapers))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    shops = {scraper.shop_name: info for scraper, info in zip(scrapers, results)}
+    if metrics_path:
+        write_json_lines((scraper._metrics for scraper in scrapers if scraper._metrics is not None), metrics_path)
+    return {
+        'shops': shops,
+        'element_count': sum(info.get('element_count') or 0 for info in shops.values()),
+        'error_count': sum(len(info.get('errors', [])) for info in shops.values()),
+        'elapsed': round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fetching import PageResult
+from storage import get_insert
+from structures import PageCache
+
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(rows: Iterable[tuple[str, int]]) -> str:
+    payload = json.dumps(sorted(rows), ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# page cache state for one scrape run of one shop
+class PageCacheRun:
+    def __init__(self, shop_id: int, update_date: date, entries: dict[str, PageCache]):
+        self.shop_id = shop_id
+        self.update_date = update_date
+        self.entries = entries
+        self.unchanged_rows: list[tuple[str, int]] = []
+        self.unchanged_pages = 0
+        self._updates: dict[str, dict] = {}
+
+    @classmethod
+    async def load(cls, session: AsyncSession, shop_id: int, update_date: date, urls: list[str]) -> "PageCacheRun":
+        result = await session.scalars(select(PageCache).where(PageCache.url.in_(urls)))
+        return cls(shop_id, update_date, {entry.url: entry for entry in result.all()})
+
+    def headers(self, url: str) -> dict[str, str]:
+        entry = self.entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def reuse(self, page: PageResult) -> Optional[list[tuple[str, int]]]:
+        # rows of a page that answered 304, nothing to parse or write now
+        entry = self.entries.get(page.url)
+        if not page.not_modified or entry is None:
+            return None
+        rows = [tuple(row) for row in entry.rows]
+        self.unchanged_rows.extend(rows)
+        self.unchanged_pages += 1
+        return rows
+
+    def record(self, page: PageResult, rows: list[tuple[str, int]]) -> bool:
+        # returns True when the extracted products are the same as last time
+        content_hash = fingerprint(rows)
+        entry = self.entries.get(page.url)
+        unchanged = entry is not None and entry.content_hash == content_hash
+        if unchanged:
+            self.unchanged_rows.extend(rows)
+            self.unchanged_pages += 1
+
+        self._updates[page.url] = {
+            'url': page.url,
+            'shop_id': self.shop_id,
+            'etag': page.etag,
+            'last_modified': page.last_modified,
+            'content_hash': content_hash,
+            'rows': [list(row) for row in rows],
+            'update_date': self.update_date,
+        }
+        return unchanged
+
+    async def save(self, session: AsyncSession) -> None:
+        if not self._updates:
+            return
+        insert = get_insert(session)
+        stmt = insert(PageCache).values(list(self._updates.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['url'],
+            set_={column: stmt.excluded[column]
+                  for column in ('shop_id', 'etag', 'last_modified', 'content_hash', 'rows', 'update_date')}
+        )
+        await session.execute(stmt)
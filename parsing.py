@@ -1,189 +1,195 @@
-from contextlib import asynccontextmanager
-from pkgutil import get_data
-from typing import AsyncGenerator, Optional, Dict, Any
-import bs4
-import requests
+from concurrent.futures import Executor
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Optional
 import logging
-from playwright.async_api import async_playwright
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from parsing_scheme import ShopScraperSchema, ConnectionParamsSchema, ScraperConfigSchema
-from structures import User, Product, Shop
-from botconfig import load_config
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
+import time
+from parsing_scheme import ShopScraperSchema
+from database import get_session
+from fetching import PageFetcher, PageResult, HostLimiter
+from browser_pool import browser_pool
+from extraction import clean_price, extract_async
+from storage import BATCH_SIZE, upsert_products, shop_registry
+from page_cache import PageCacheRun, fingerprint
+from history import record_price_intervals, prune_daily_rows
+from identity import identity_registry
+from result_cache import query_cache
+from scrape_metrics import ScrapeMetrics
 from datetime import date
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-config = load_config(".env")
-engine = create_async_engine(
-    url=f"postgresql+asyncpg://{config.db.user}:{config.db.password}@{config.db.host}:{config.db.port}/{config.db.name}",
-    pool_size=5,
-    max_overflow=5,
-    echo=False
-)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
-# session factory with async context manager
-@asynccontextmanager
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session() as session:
-        try:
-            async with session.begin():
-                yield session
-        except Exception as e:
-            logger.error(f"Database error: {e}", exc_info=True)
-            raise
-
 # main class to scrape
 class ShopScraper(ShopScraperSchema):
+    # counters of the current (or last) run, see scrape_metrics
+    _metrics: Optional[ScrapeMetrics] = None
+
     def __init__(self, **data):
         super().__init__(**data)
 
     @staticmethod
     def _clean_price(price_str: str) -> int:
-        try:
-            return int(price_str.replace('Цена', '').split(".")[0].split(",")[0].strip())
-        except (ValueError, AttributeError):
-            return 0
+        return clean_price(price_str)
 
     def _update_page_number(self, page_num: int) -> str:
-        return self.link.replace('=1', f'={page_num}')
+        parts = urlsplit(self.link)
+        query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                 if key != self.page_param]
+        query.append((self.page_param, str(page_num)))
+        return urlunsplit(parts._replace(query=urlencode(query)))
 
     @staticmethod
     def _get_current_date() -> date:
         return date.today()
 
-    async def scrape(self):
+    # scrapers are module-level and reused by the scheduler, each run starts from a clean report
+    async def scrape(self, limiter: Optional[HostLimiter] = None, executor: Optional[Executor] = None):
+        self.debug_info = type(self).model_fields['debug_info'].default_factory()
         if self.website_method == 'dynamic':
-            return await self._dynamic_scrape()
+            return await self._dynamic_scrape(limiter=limiter, executor=executor)
         elif self.website_method == 'static':
-            return await self._static_scrape()
+            return await self._static_scrape(limiter=limiter, executor=executor)
         else:
             raise ValueError("Invalid website_method. Supported methods are 'dynamic' and 'static'.")
 
-    async def _update_database(self, name: str, cost: int):
+    async def _update_database(self, rows: list[tuple[str, int]]):
+        if not rows:
+            return
+        started = time.perf_counter()
+        shop_id = await shop_registry.get_id(get_session, self.shop_name)
+        identities = await identity_registry.resolve(get_session, (name for name, _ in rows))
         async with get_session() as session:
             try:
-                shop = await session.scalar(select(Shop).filter_by(name=self.shop_name))
-                if not shop:
-                    shop = Shop(name=self.shop_name)
-                    session.add(shop)
-                    await session.commit()
-
-                product = await session.scalar(
-                    select(Product).filter_by(
-                        name=name,
-                        shop_id=shop.id,
-                        update_date=self._get_current_date()
-                    )
-                )
-                if product:
-                    product.cost = cost
-                else:
-                    session.add(Product(
-                        name=name,
-                        cost=cost,
-                        shop_id=shop.id,
-                        update_date=self._get_current_date()
-                    ))
-                await session.commit()
+                written = await upsert_products(session, rows, shop_id, self._get_current_date(), identities)
+                if self.history_mode == 'intervals':
+                    await record_price_intervals(session, rows, shop_id, self._get_current_date(), identities)
             except Exception as e:
                 logger.error(f"Database update failed: {e}", exc_info=True)
-                await session.rollback()
                 raise
+        if self._metrics is not None:
+            self._metrics.add_write(written, -(-written // BATCH_SIZE), time.perf_counter() - started)
 
 
-    async def _finalize_debug_info(self):
-        async with get_session() as session:
-            self.debug_info['element_count'] = await session.scalar(
-                select(func.count(Product.id)).filter_by(shop_id=Shop.id, update_date=self._get_current_date())
-            )
+    # element_count is what this run wrote, taken from the run's counters
+    def _finalize_debug_info(self):
+        summary = self._metrics.finish().summary()
+        self.debug_info['element_count'] = summary['rows_written']
+        self.debug_info['metrics'] = summary
         return self.debug_info
 
+    async def _parse_content(self, content: str, executor: Optional[Executor] = None,
+                             write: bool = True) -> list[tuple[str, int]]:
+        results, errors = await extract_async(self.scraper_config, content, self.parser_backend, executor)
+        self.debug_info.setdefault('errors', []).extend(errors)
 
-    async def _get_element_count(self) -> int:
-        async with get_session() as session:
-            result = await session.execute(
-                select(func.count(Product.id)).filter(
-                    Products.shop_id == self.shop.id,
-                    Products.update_date == self._get_current_date()
-                )
-            )
-            return result.scalar()
-
-    async def _process_element(self, element: bs4.element.Tag) -> Optional[tuple]:
-        try:
-            name_element = element.find(
-                self.scraper_config.name_class,
-                class_=self.scraper_config.name_link
-            )
-            if not name_element:
-                return None
-
-            cost_element = element.find(
-                self.scraper_config.cost_class,
-                class_=self.scraper_config.cost_link
-            )
-
-            return (
-                name_element.text.strip(),
-                self._clean_price(cost_element.text) if cost_element else 0
-            )
-        except Exception as e:
-            logger.error(f"Element processing error: {e}", exc_info=True)
-            self.debug_info.setdefault('errors', []).append(str(e))
-            return None
-
-
-    async def _parse_content(self, content: str):
-        soup = bs4.BeautifulSoup(content, "html.parser")
-        elements = soup.find_all(
-            self.scraper_config.main_class,
-            class_=self.scraper_config.main_link
-        )
-
-        for idx, element in enumerate(elements, 1):
-            if result := await self._process_element(element):
-                await self._update_database(*result)
+        rows = []
+        for idx, result in enumerate(results, 1):
+            if result:
+                rows.append(result)
                 self.debug_info['processed_elements'] = idx
             else:
                 self.debug_info['element_status'] = False
+                if write:
+                    await self._update_database(rows)
                 raise ValueError("Element processing failed.")
 
+        if write:
+            await self._update_database(rows)
+        return rows
+
+
+    async def _dynamic_scrape(self, pages: Optional[int] = None, limiter: Optional[HostLimiter] = None,
+                              executor: Optional[Executor] = None):
+        # a browser tab can't send per-page If-None-Match / If-Modified-Since, so the page cache's
+        # conditional headers are not passed on; unchanged pages are still caught by their content hash
+        return await self._scrape_pages(
+            lambda links, headers, on_request: browser_pool.fetch_many(
+                links, concurrency=self.concurrency, limiter=limiter, on_request=on_request,
+                connection_params=self.connection_params
+            ),
+            pages, executor
+        )
 
-    async def _dynamic_scrape(self):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                channel='chrome',
-                headless=False,
-                args=["--start-maximized"]
-            )
-            try:
-                context = await browser.new_context(no_viewport=True)
-                page = await context.new_page()
-                await self._process_pages_dynamic(page)
-            finally:
-                await browser.close()
-        return await self._finalize_debug_info()
 
+    async def _static_scrape(self, pages: Optional[int] = None, limiter: Optional[HostLimiter] = None,
+                             executor: Optional[Executor] = None):
+        async with PageFetcher(self.connection_params, concurrency=self.concurrency, limiter=limiter) as fetcher:
+            return await self._scrape_pages(
+                lambda links, headers, on_request: fetcher.fetch_many(links, headers=headers, on_request=on_request),
+                pages, executor
+            )
 
-    async def _static_scrape(self, pages: int = 5):
-        for page_num in range(1, pages + 1):
-            current_link = self._update_page_number(page_num)
-            try:
-                response = requests.get(
-                    current_link,
-                    headers=self.connection_params.headers,
-                    cookies=self.connection_params.cookies,
-                    params=self.connection_params.params
-                )
-                self.debug_info['status_code'] = response.status_code
-                await self._parse_content(response.text)
-            except Exception as e:
-                logger.error(f"Request failed: {e}")
-                self.debug_info.setdefault('errors', []).append(str(e))
 
-        return await self._finalize_debug_info()
+    # fetches ahead speculatively and stops at the first empty page or one seen earlier in the run
+    async def _scrape_pages(self, fetch_many: Callable[..., AsyncIterator[PageResult]],
+                            pages: Optional[int], executor: Optional[Executor]):
+        links = [self._update_page_number(page_num) for page_num in range(1, (pages or self.max_pages) + 1)]
+        self._metrics = metrics = ScrapeMetrics(self.shop_name)
+        shop_id = await shop_registry.get_id(get_session, self.shop_name)
+        async with get_session() as session:
+            page_cache = await PageCacheRun.load(session, shop_id, self._get_current_date(), links)
+
+        # counted by the fetchers when a request really goes out, so speculative requests are in
+        # but links the window queued and cancelled before a slot freed up are not
+        pages_requested = 0
+
+        def count_request(url: str) -> None:
+            nonlocal pages_requested
+            pages_requested += 1
+
+        pages_processed = 0
+        seen_hashes = set()
+        async with aclosing(fetch_many(links, page_cache.headers, count_request)) as results:
+            async for page in results:
+                pages_processed += 1
+                if page.error:
+                    metrics.add_page(page)
+                    self.debug_info.setdefault('errors', []).append(page.error)
+                    continue
+                self.debug_info['status_code'] = page.status
+                # a 429 or 5xx body has no cards either, only a 2xx page without cards ends the catalog
+                if page.status is not None and not (200 <= page.status < 300 or page.not_modified):
+                    error = f"HTTP {page.status} for {page.url}"
+                    logger.error(error)
+                    metrics.add_page(page).error = error
+                    self.debug_info.setdefault('errors', []).append(error)
+                    continue
+                try:
+                    rows = page_cache.reuse(page)
+                    cached = rows is not None
+                    parse_started = time.perf_counter()
+                    if not cached:
+                        rows = await self._parse_content(page.text, executor, write=False)
+                    page_metrics = metrics.add_page(page, time.perf_counter() - parse_started if not cached else 0.0,
+                                                    len(rows), cached=cached, unchanged=cached)
+
+                    content_hash = fingerprint(rows)
+                    # some sites answer an out-of-range page number with an earlier page
+                    if not rows or content_hash in seen_hashes:
+                        break
+                    seen_hashes.add(content_hash)
+
+                    if not cached:
+                        page_metrics.unchanged = page_cache.record(page, rows)
+                        if not page_metrics.unchanged:
+                            await self._update_database(rows)
+                except Exception as e:
+                    # fetch errors were handled above, this is parsing or writing the page
+                    logger.error(f"Page processing failed for {page.url}: {e}")
+                    self.debug_info.setdefault('errors', []).append(str(e))
+
+        # unchanged pages only get today's rows, in one bulk write
+        await self._update_database(page_cache.unchanged_rows)
+        async with get_session() as session:
+            await page_cache.save(session)
+            if self.history_mode == 'intervals':
+                await prune_daily_rows(session, shop_id, before=self._get_current_date())
+        # today's data changed, cached bot answers are stale now
+        query_cache.invalidate()
+        self.debug_info['unchanged_pages'] = page_cache.unchanged_pages
+        self.debug_info['pages_fetched'] = pages_requested
+        self.debug_info['pages_processed'] = pages_processed
+
+        return self._finalize_debug_info()
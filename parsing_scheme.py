@@ -28,6 +28,11 @@ class ShopScraperSchema(BaseModel):
     connection_params: ConnectionParamsSchema
     scraper_config: ScraperConfigSchema
     website_method: str
+    concurrency: int = 4
+    parser_backend: str = 'auto'
+    page_param: str = 'page'
+    max_pages: int = 50
+    history_mode: str = 'daily'
     debug_info: Dict[str, Any] = Field(
         default_factory=lambda: {
             "errors": [],
@@ -37,6 +42,12 @@ class ShopScraperSchema(BaseModel):
     )
     utc_date: date = Field(default_factory=date.today)
 
+    @validator('history_mode')
+    def check_history_mode(cls, v):
+        if v not in ('daily', 'intervals'):
+            raise ValueError("history_mode must be 'daily' or 'intervals'")
+        return v
+
     @validator('debug_info', pre=True, always=True)
     def init_errors(cls, v):
         if 'errors' not in v:
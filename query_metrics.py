@@ -0,0 +1,98 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENTS = 500
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_placeholder_lists = re.compile(r"\((?:\s*(?:\?|\$\?|%\(\w+\)s|:\w+)\s*,?)+\)")
+_repeated_lists = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+
+
+# statements differing only in literals or in the length of IN (...) / VALUES lists share a fingerprint
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    statement = " ".join(statement.split())
+    statement = _literals.sub("?", statement)
+    statement = _placeholder_lists.sub("(...)", statement)
+    return _repeated_lists.sub("(...)", statement)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    slow: int = 0
+
+
+class QueryMetrics:
+    def __init__(self):
+        self.statements: dict[str, QueryStats] = {}
+
+    def observe(self, statement: str, seconds: float, slow_threshold: float) -> None:
+        key = fingerprint(statement)
+        stats = self.statements.get(key)
+        if stats is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                key = 'other'
+                stats = self.statements.setdefault(key, QueryStats())
+            else:
+                stats = self.statements[key] = QueryStats()
+        stats.count += 1
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        if seconds >= slow_threshold:
+            stats.slow += 1
+            logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {key}")
+
+    def top(self, limit: int = 10) -> list[tuple[str, QueryStats]]:
+        return sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+
+
+query_metrics = QueryMetrics()
+
+# DB time spent inside the current handler call, see track_db_time
+_db_time: ContextVar[Optional[list[float]]] = ContextVar('db_time', default=None)
+
+
+@contextmanager
+def track_db_time() -> Iterator[list[float]]:
+    holder = [0.0]
+    token = _db_time.set(holder)
+    try:
+        yield holder
+    finally:
+        _db_time.reset(token)
+
+
+def install_query_hooks(engine: AsyncEngine, slow_threshold: float, metrics: QueryMetrics = query_metrics) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        metrics.observe(statement, seconds, slow_threshold)
+        if (holder := _db_time.get()) is not None:
+            holder[0] += seconds
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def handle_error(context):
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
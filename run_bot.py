@@ -0,0 +1,30 @@
+import asyncio
+
+from botconfig import load_config
+from database import dispose_engine
+from schema import create_tables
+from telbot import main_bot, serve_webhook
+
+
+async def _prepare():
+    await create_tables()
+    # webhook workers open their own engines, the parent's pool is not needed past this point
+    await dispose_engine()
+
+
+async def _polling():
+    await create_tables()
+    await main_bot()
+
+
+# bot-only entry point: scrapes run elsewhere (run_scraper.py), the catalog is reloaded as data lands
+def main():
+    if load_config(".env").tg_bot.mode == 'webhook':
+        asyncio.run(_prepare())
+        serve_webhook()
+    else:
+        asyncio.run(_polling())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+from typing import Optional
+
+from botconfig import ScrapeConfig, load_scrape_config
+from browser_pool import browser_pool
+from catalog import catalog
+from database import dispose_engine, get_engine, get_session, get_session_pool, pool_stats
+from headers import magnit
+from identity import backfill_identities
+from orchestrator import scrape_all
+from scheduler import ScrapeScheduler
+from schema import create_tables
+
+
+scrapers = [magnit]  # perekrestok
+
+
+# the snapshot only matters in a process that also answers the bot, a separate bot watches the table
+async def scrape_batch(batch: list, processes: Optional[int] = None, refresh_catalog: bool = True):
+    report = await scrape_all(batch, processes=processes, metrics_path="scrape_metrics.jsonl")
+    report['db_pool'] = pool_stats(get_engine())
+    print(report)
+    if refresh_catalog:
+        await catalog.refresh(get_session_pool())
+
+
+async def scrap(refresh_catalog: bool = True):
+    try:
+        await scrape_batch(scrapers, refresh_catalog=refresh_catalog)
+    finally:
+        await browser_pool.close()
+
+
+def build_scheduler(config: ScrapeConfig, refresh_catalog: bool = True) -> ScrapeScheduler:
+    return ScrapeScheduler(
+        scrapers,
+        lambda batch: scrape_batch(batch, processes=config.processes or None, refresh_catalog=refresh_catalog),
+        interval=config.interval,
+        jitter=config.jitter,
+        run_on_start=config.on_start,
+        on_idle=browser_pool.close
+    )
+
+
+# scraper-only entry point: no aiogram, no bot token, one run or the scheduled loop
+async def main(once: bool = False, backfill: bool = False):
+    await create_tables()
+    try:
+        if backfill:
+            await backfill_identities(get_session)
+            return
+        if once:
+            await scrap(refresh_catalog=False)
+            return
+
+        scheduler = build_scheduler(load_scrape_config(".env"), refresh_catalog=False)
+        scheduler.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await scheduler.stop()
+            await browser_pool.close()
+    finally:
+        await dispose_engine()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape the shops without starting the bot.")
+    parser.add_argument('--once', action='store_true', help="scrape once and exit instead of on the schedule")
+    parser.add_argument('--backfill-identities', action='store_true',
+                        help="link rows written before product identities existed, then exit")
+    args = parser.parse_args()
+    asyncio.run(main(once=args.once, backfill=args.backfill_identities))
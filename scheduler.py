@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Iterable, Optional
+
+from parsing import ShopScraper
+
+
+logger = logging.getLogger(__name__)
+
+
+# runs scrapes in the background of the bot's loop: every `interval` seconds, +/- `jitter`,
+# each shop that isn't still busy with the previous run is scraped again
+class ScrapeScheduler:
+    def __init__(self, scrapers: Iterable[ShopScraper], run: Callable[[list[ShopScraper]], Awaitable],
+                 interval: float, jitter: float = 0.0, run_on_start: bool = True,
+                 on_idle: Optional[Callable[[], Awaitable]] = None):
+        self.scrapers = list(scrapers)
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        self.run_on_start = run_on_start
+        self.on_idle = on_idle
+        self._running: set[str] = set()
+        self._batches: set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop(), name="scrape-scheduler")
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._loop_task, *self._batches) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+
+    def _delay(self) -> float:
+        return max(0.0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    async def _loop(self) -> None:
+        if not self.run_on_start:
+            await asyncio.sleep(self._delay())
+        while True:
+            self.trigger()
+            if self.interval <= 0:
+                # a single run at startup, no cadence
+                return
+            await asyncio.sleep(self._delay())
+
+    # starts a run for every idle shop, returns the batch task or None when all are still busy
+    def trigger(self) -> Optional[asyncio.Task]:
+        scrapers = [scraper for scraper in self.scrapers if scraper.shop_name not in self._running]
+        skipped = len(self.scrapers) - len(scrapers)
+        if skipped:
+            logger.warning(f"{skipped} shop(s) still scraping since the previous run, skipped this time")
+        if not scrapers:
+            return None
+
+        self._running.update(scraper.shop_name for scraper in scrapers)
+        batch = asyncio.create_task(self._run_batch(scrapers))
+        self._batches.add(batch)
+        batch.add_done_callback(self._batches.discard)
+        return batch
+
+    async def _run_batch(self, scrapers: list[ShopScraper]) -> None:
+        try:
+            await self.run(scrapers)
+        except Exception as e:
+            logger.error(f"Scheduled scrape failed: {e}", exc_info=True)
+        finally:
+            self._running.difference_update(scraper.shop_name for scraper in scrapers)
+            # shared resources (the browser) are released once no batch needs them
+            if not self._running and self.on_idle is not None:
+                try:
+                    await self.on_idle()
+                except Exception as e:
+                    logger.error(f"Scheduler idle hook failed: {e}", exc_info=True)
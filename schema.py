@@ -0,0 +1,61 @@
+import logging
+
+from sqlalchemy import Connection, inspect, text
+
+from database import get_engine
+from search import create_search_index
+from structures import Base, PriceInterval, Product
+
+
+logger = logging.getLogger(__name__)
+
+# name-keyed history indexes, history is read by identity_id now and they only slowed down upserts
+_dropped_indexes = ('ix_products_shop_name_date', 'ix_price_intervals_shop_name_end')
+
+
+# the bulk upsert's ON CONFLICT target, products tables from before it may hold duplicate days:
+# the last written row of each (name, shop_id, update_date) is kept
+def _add_product_key(connection: Connection) -> None:
+    inspector = inspect(connection)
+    key = {'name', 'shop_id', 'update_date'}
+    unique = [constraint['column_names'] for constraint in inspector.get_unique_constraints('products')]
+    unique += [index['column_names'] for index in inspector.get_indexes('products') if index['unique']]
+    if any(set(columns) == key for columns in unique):
+        return
+
+    result = connection.execute(text(
+        "DELETE FROM products WHERE id NOT IN "
+        "(SELECT max(id) FROM products GROUP BY name, shop_id, update_date)"
+    ))
+    if result.rowcount:
+        logger.info(f"Removed {result.rowcount} duplicate product rows")
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS unique_product_shop_date ON products (name, shop_id, update_date)"
+    ))
+
+
+# create_all only adds missing tables; columns and indexes added to tables that already exist
+# are brought in here, every step checks first so it is safe on every start
+def upgrade_schema(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for table in (Product.__table__, PriceInterval.__table__):
+        if 'identity_id' not in {column['name'] for column in inspector.get_columns(table.name)}:
+            logger.info(f"Adding {table.name}.identity_id")
+            connection.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN identity_id INTEGER REFERENCES product_identity (id)"
+            ))
+    _add_product_key(connection)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    for name in _dropped_indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+# shared by both entry points, whichever process comes up first creates what is missing
+async def create_tables():
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(upgrade_schema)
+        await connection.run_sync(create_search_index)
@@ -0,0 +1,126 @@
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Optional
+
+from fetching import PageResult
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageMetrics:
+    url: str
+    status: Optional[int]
+    fetch_seconds: Optional[float]
+    bytes: int
+    parse_seconds: float = 0.0
+    rows: int = 0
+    cached: bool = False
+    unchanged: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class WriteMetrics:
+    rows: int
+    batches: int
+    seconds: float
+
+
+# counters for one scrape run of one shop, filled as pages go by instead of re-queried afterwards
+@dataclass
+class ScrapeMetrics:
+    shop: str
+    started: float = field(default_factory=time.time)
+    elapsed: Optional[float] = None
+    pages: list[PageMetrics] = field(default_factory=list)
+    writes: list[WriteMetrics] = field(default_factory=list)
+
+    def add_page(self, page: PageResult, parse_seconds: float = 0.0, rows: int = 0,
+                 cached: bool = False, unchanged: bool = False) -> PageMetrics:
+        metrics = PageMetrics(url=page.url, status=page.status, fetch_seconds=page.elapsed, bytes=page.size,
+                              parse_seconds=parse_seconds, rows=rows, cached=cached, unchanged=unchanged,
+                              error=page.error)
+        self.pages.append(metrics)
+        return metrics
+
+    def add_write(self, rows: int, batches: int, seconds: float) -> None:
+        self.writes.append(WriteMetrics(rows, batches, seconds))
+
+    def finish(self) -> "ScrapeMetrics":
+        self.elapsed = time.time() - self.started
+        latest_runs[self.shop] = self
+        return self
+
+    def summary(self) -> dict:
+        fetch_times = [page.fetch_seconds for page in self.pages if page.fetch_seconds is not None]
+        return {
+            'pages': len(self.pages),
+            'pages_cached': sum(page.cached for page in self.pages),
+            'pages_unchanged': sum(page.unchanged for page in self.pages),
+            'pages_failed': sum(page.error is not None for page in self.pages),
+            'bytes': sum(page.bytes for page in self.pages),
+            'fetch_seconds': round(sum(fetch_times), 4),
+            'fetch_seconds_max': round(max(fetch_times, default=0.0), 4),
+            'parse_seconds': round(sum(page.parse_seconds for page in self.pages), 4),
+            'rows_extracted': sum(page.rows for page in self.pages),
+            'rows_written': sum(write.rows for write in self.writes),
+            'writes': len(self.writes),
+            'write_batches': sum(write.batches for write in self.writes),
+            'write_seconds': round(sum(write.seconds for write in self.writes), 4),
+            'elapsed': round(self.elapsed, 4) if self.elapsed is not None else None,
+        }
+
+    def json_lines(self) -> list[str]:
+        base = {'shop': self.shop, 'started': self.started}
+        lines = [json.dumps({'type': 'page', **base, **asdict(page)}, ensure_ascii=False) for page in self.pages]
+        lines += [json.dumps({'type': 'write', **base, **asdict(write)}, ensure_ascii=False) for write in self.writes]
+        lines.append(json.dumps({'type': 'run', **base, **self.summary()}, ensure_ascii=False))
+        return lines
+
+
+# the last finished run per shop, read by the metrics export
+latest_runs: dict[str, ScrapeMetrics] = {}
+
+
+def write_json_lines(runs: Iterable[ScrapeMetrics], path: str) -> None:
+    with open(path, 'a', encoding='utf-8') as file:
+        for run in runs:
+            file.writelines(line + '\n' for line in run.json_lines())
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_prometheus_metrics = (
+    ('scrape_last_run_timestamp_seconds', 'gauge', 'Start of the last scrape run.', lambda run, s: run.started),
+    ('scrape_duration_seconds', 'gauge', 'Wall time of the last scrape run.', lambda run, s: s['elapsed'] or 0.0),
+    ('scrape_pages', 'gauge', 'Pages handled in the last run.', lambda run, s: s['pages']),
+    ('scrape_pages_cached', 'gauge', 'Pages answered 304 Not Modified.', lambda run, s: s['pages_cached']),
+    ('scrape_pages_unchanged', 'gauge', 'Pages whose products did not change.', lambda run, s: s['pages_unchanged']),
+    ('scrape_pages_failed', 'gauge', 'Pages that failed to load.', lambda run, s: s['pages_failed']),
+    ('scrape_response_bytes', 'gauge', 'Bytes downloaded in the last run.', lambda run, s: s['bytes']),
+    ('scrape_fetch_seconds', 'gauge', 'Summed page fetch latency.', lambda run, s: s['fetch_seconds']),
+    ('scrape_fetch_seconds_max', 'gauge', 'Slowest page fetch.', lambda run, s: s['fetch_seconds_max']),
+    ('scrape_parse_seconds', 'gauge', 'Time spent extracting products.', lambda run, s: s['parse_seconds']),
+    ('scrape_rows_extracted', 'gauge', 'Products extracted from pages.', lambda run, s: s['rows_extracted']),
+    ('scrape_rows_written', 'gauge', 'Products written to the database.', lambda run, s: s['rows_written']),
+    ('scrape_write_batches', 'gauge', 'Upsert statements executed.', lambda run, s: s['write_batches']),
+    ('scrape_write_seconds', 'gauge', 'Time spent writing to the database.', lambda run, s: s['write_seconds']),
+)
+
+
+def prometheus_text(runs: Optional[Iterable[ScrapeMetrics]] = None) -> str:
+    runs = list(latest_runs.values() if runs is None else runs)
+    summaries = [(run, run.summary()) for run in runs]
+    lines = []
+    for name, kind, help_text, value in _prometheus_metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for run, summary in summaries:
+            lines.append(f'{name}{{shop="{_label(run.shop)}"}} {value(run, summary)}')
+    return "\n".join(lines) + "\n"
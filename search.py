@@ -0,0 +1,93 @@
+import logging
+from typing import Optional, Sequence
+
+from sqlalchemy import Connection, Select, and_, event, func, inspect, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from structures import Product
+
+
+logger = logging.getLogger(__name__)
+
+# FTS5 trigram tokens need at least three characters
+MIN_TRIGRAM_LENGTH = 3
+
+_postgresql_ddl = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+)
+
+# triggers keep the external-content FTS table in sync with every insert and upsert into products
+_sqlite_ddl = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+    "USING fts5(name, content='products', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO products_fts(rowid, name) VALUES (new.id, new.name); END",
+)
+
+
+# run with connection.run_sync after create_all, safe to call on every start
+def create_search_index(connection: Connection) -> None:
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        for statement in _postgresql_ddl:
+            connection.execute(text(statement))
+    elif dialect == 'sqlite':
+        is_new = not inspect(connection).has_table('products_fts')
+        for statement in _sqlite_ddl:
+            connection.execute(text(statement))
+        if is_new:
+            connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    else:
+        logger.warning(f"No name search index for dialect '{dialect}', falling back to ILIKE.")
+
+
+# SQLite's lower() only folds ASCII, the rank needs Cyrillic names folded too
+def install_sqlite_functions(engine: AsyncEngine) -> None:
+    @event.listens_for(engine.sync_engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function('unicode_lower', 1, str.lower, deterministic=True)
+
+
+def _sqlite_rank(term: str):
+    # earliest match first, then shorter names, like the catalog snapshot orders them
+    position = func.instr(func.unicode_lower(Product.name), term.lower())
+    return position * 10000 + func.length(Product.name)
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+# (Product, rank) rows whose name contains `term`, best matches first; the rank only
+# depends on the row itself, so (rank, id) is a stable keyset cursor between pages
+def search_products(dialect: str, term: str, after: Optional[Sequence] = None) -> Select:
+    term = term.strip()
+    if dialect == 'postgresql':
+        rank = -func.word_similarity(term, Product.name)
+        query = select(Product, rank.label('rank')).where(Product.name.ilike(f"%{term}%"))
+    elif dialect == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH:
+        matches = (
+            select(literal_column('rowid').label('id'))
+            .select_from(text('products_fts'))
+            .where(text('products_fts MATCH :phrase').bindparams(phrase=_fts_phrase(term)))
+            .subquery()
+        )
+        rank = _sqlite_rank(term)
+        query = select(Product, rank.label('rank')).join(matches, matches.c.id == Product.id)
+    elif dialect == 'sqlite':
+        rank = _sqlite_rank(term)
+        query = select(Product, rank.label('rank')).where(Product.name.ilike(f"%{term}%"))
+    else:
+        rank = func.length(Product.name)
+        query = select(Product, rank.label('rank')).where(Product.name.ilike(f"%{term}%"))
+
+    if after is not None:
+        last_rank, last_id = after
+        query = query.where(or_(rank > last_rank, and_(rank == last_rank, Product.id > last_id)))
+    return query.order_by(rank, Product.id)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from datetime import date
+from typing import AsyncContextManager, Callable, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from structures import Product, Shop
+
+
+logger = logging.getLogger(__name__)
+
+# 5 bound columns per row, keeps us under SQLite's 999 variables limit
+BATCH_SIZE = 190
+
+_dialect_inserts = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def get_insert(session: AsyncSession):
+    dialect = session.bind.dialect.name
+    try:
+        return _dialect_inserts[dialect]
+    except KeyError:
+        raise ValueError(f"Bulk upsert is not supported for dialect '{dialect}'.")
+
+
+def _dedupe(rows: Iterable[tuple[str, int]]) -> list[tuple[str, int]]:
+    # the same key twice in one statement breaks ON CONFLICT, last price wins
+    return list(dict(rows).items())
+
+
+async def upsert_products(session: AsyncSession, rows: Iterable[tuple[str, int]],
+                          shop_id: int, update_date: date, identities: Optional[dict[str, int]] = None) -> int:
+    identities = identities or {}
+    rows = _dedupe(rows)
+    if not rows:
+        return 0
+
+    insert = get_insert(session)
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        stmt = insert(Product).values([
+            {'name': name, 'cost': cost, 'shop_id': shop_id, 'update_date': update_date,
+             'identity_id': identities.get(name)}
+            for name, cost in batch
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name', 'shop_id', 'update_date'],
+            set_={'cost': stmt.excluded.cost, 'identity_id': stmt.excluded.identity_id}
+        )
+        await session.execute(stmt)
+
+    return len(rows)
+
+
+# process-wide shop name -> id cache, the row is created at most once per name
+class ShopRegistry:
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    # resolves in its own transaction so a later rollback can't leave a stale id cached
+    async def get_id(self, session_factory: Callable[[], AsyncContextManager[AsyncSession]],
+                     shop_name: str) -> int:
+        if (shop_id := self._ids.get(shop_name)) is not None:
+            return shop_id
+
+        lock = self._locks.setdefault(shop_name, asyncio.Lock())
+        async with lock:
+            if (shop_id := self._ids.get(shop_name)) is None:
+                async with session_factory() as session:
+                    shop_id = await self._resolve(session, shop_name)
+                self._ids[shop_name] = shop_id
+        return shop_id
+
+    @staticmethod
+    async def _resolve(session: AsyncSession, shop_name: str) -> int:
+        # DO NOTHING + SELECT stays correct when another process creates the shop first
+        insert = get_insert(session)
+        await session.execute(
+            insert(Shop).values(name=shop_name).on_conflict_do_nothing(index_elements=['name'])
+        )
+        return await session.scalar(select(Shop.id).filter_by(name=shop_name))
+
+    def forget(self, shop_name: str | None = None) -> None:
+        if shop_name is None:
+            self._ids.clear()
+        else:
+            self._ids.pop(shop_name, None)
+
+
+shop_registry = ShopRegistry()
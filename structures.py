@@ -1,7 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from typing import Optional, List
 from datetime import date
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, Float, BigInteger, Date, func
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, Index, Float, BigInteger, Date, JSON, func
 
 # DB = Postgresql(14)
 
@@ -30,13 +30,65 @@ class Shop(Base):
     products: Mapped[List['Product']] = relationship(back_populates='shop', cascade='all, delete-orphan')
 
 
+class ProductIdentity(Base):
+    __tablename__ = 'product_identity'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    canonical: Mapped[str] = mapped_column(unique=True)
+    name: Mapped[str]
+
+
 class Product(Base):
     __tablename__ = 'products'
+    __table_args__ = (
+        UniqueConstraint('name', 'shop_id', 'update_date', name='unique_product_shop_date'),
+        Index('ix_products_date_cost', 'update_date', 'cost', 'id'),
+        Index('ix_products_shop_identity_date', 'shop_id', 'identity_id', 'update_date'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
     cost: Mapped[int]
     update_date: Mapped[date] = mapped_column(Date, server_default=func.now())
     shop_id: Mapped[int] = mapped_column(ForeignKey('shops.id', ondelete='CASCADE'), index=True)
+    identity_id: Mapped[Optional[int]] = mapped_column(ForeignKey('product_identity.id'))
 
     shop: Mapped['Shop'] = relationship(back_populates='products')
+
+
+class PageCache(Base):
+    __tablename__ = 'page_cache'
+
+    url: Mapped[str] = mapped_column(primary_key=True)
+    shop_id: Mapped[int] = mapped_column(ForeignKey('shops.id', ondelete='CASCADE'), index=True)
+    etag: Mapped[Optional[str]]
+    last_modified: Mapped[Optional[str]]
+    content_hash: Mapped[str] = mapped_column(String(64))
+    rows: Mapped[list] = mapped_column(JSON)
+    update_date: Mapped[date] = mapped_column(Date)
+
+
+# change-only price history: one row per run of equal prices, see history.py
+class PriceInterval(Base):
+    __tablename__ = 'price_intervals'
+    __table_args__ = (
+        UniqueConstraint('shop_id', 'name', 'valid_from', name='unique_interval_shop_name_start'),
+        Index('ix_price_intervals_shop_identity_end', 'shop_id', 'identity_id', 'valid_to'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    cost: Mapped[int]
+    valid_from: Mapped[date] = mapped_column(Date)
+    valid_to: Mapped[date] = mapped_column(Date)
+    shop_id: Mapped[int] = mapped_column(ForeignKey('shops.id', ondelete='CASCADE'))
+    identity_id: Mapped[Optional[int]] = mapped_column(ForeignKey('product_identity.id'))
+
+
+# aiogram FSM state shared by all bot workers, see fsm_storage.py
+class FSMRecord(Base):
+    __tablename__ = 'fsm_storage'
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    state: Mapped[Optional[str]]
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
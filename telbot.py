@@ -1,123 +1,170 @@
+import asyncio
+import html
+import json
 import logging
+import multiprocessing
+import time
+from functools import lru_cache
 from typing import Awaitable
-import emoji
 from aiogram import Bot, Dispatcher, types, F, BaseMiddleware, Router
 from aiogram.client.default import DefaultBotProperties
 from aiogram.filters.command import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineQuery, InlineQueryResultArticle, InputTextMessageContent
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 import sqlalchemy as db
 from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
-from botconfig import load_config
-from typing import Callable, Dict, Any, Awaitable
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, BigInteger, select, not_
-import pendulum
-import matplotlib.pyplot as plt
-import io
+from botconfig import Config, load_config
+from typing import Callable, Dict, Any, Awaitable, Hashable, Optional, Sequence
+from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, BigInteger, select, not_, and_, or_, literal, union_all
 from aiogram.types import BufferedInputFile
 from structures import *
+from search import search_products
+from catalog import catalog, CatalogItem
+from result_cache import inline_cache, query_cache
+from charts import chart_service
+from history import expand_series
+from database import get_session_pool, dispose_engine
+from fsm_storage import SQLStorage
+from bot_metrics import ApiLatencyMiddleware, HandlerLatencyMiddleware, bot_metrics, format_stats, start_metrics_server
+
+
+# rendering runs in the chart worker pool, repeated requests are served from its cache
+async def create_plot(dates: list, costs: list, key: Optional[Hashable] = None) -> BufferedInputFile:
+    if key is None:
+        key = (tuple(dates), tuple(costs))
+    started = time.perf_counter()
+    try:
+        return await chart_service.render(key, dates, costs)
+    finally:
+        bot_metrics.observe('chart', 'render', time.perf_counter() - started)
 
 
-async def create_plot(dates: list, costs: list) -> BufferedInputFile:
-    plt.figure(figsize=(12, 7))
-    plt.style.use('ggplot')
-    plt.rcParams['font.family'] = 'DejaVu Sans'
-    plt.plot(
-        dates,
-        costs,
-        marker='o',
-        linestyle='--',
-        color='#2c7be5',
-        linewidth=2,
-        markersize=8
-    )
+PAGE_SIZE = 5
 
-    plt.title("Динамика цен", fontsize=14, pad=20)
-    plt.xlabel("Дата", fontsize=12, labelpad=15)
-    plt.ylabel("Цена, RUB", fontsize=12, labelpad=15)
 
-    plt.grid(True, linestyle='--', alpha=0.3)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+# cursors are {'source', 'key'} dicts kept in the FSM state; a cursor from another
+# source (the snapshot got replaced or is not loaded) starts the search over
+def _cursor_key(cursor: Optional[dict], source: str) -> Optional[list]:
+    if cursor and cursor.get('source') == source:
+        return cursor['key']
+    return None
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    plt.close()
 
-    return BufferedInputFile(
-        file=buf.getvalue(),
-        filename="price_trend.png"
-    )
+def _keyset_page(rows: list[tuple[Sequence, Any]], source: str) -> tuple[list, Optional[dict]]:
+    elements = [element for _, element in rows[:PAGE_SIZE]]
+    if len(rows) <= PAGE_SIZE:
+        return elements, None
+    return elements, {'source': source, 'key': list(rows[PAGE_SIZE - 1][0])}
+
 
+# a new snapshot changes the version, so entries built on the old view are never hit
+def _cache_key(kind: str, term: Any, cursor: Optional[dict]) -> tuple:
+    return kind, date.today(), catalog.version, term, json.dumps(cursor, sort_keys=True) if cursor else None
 
-async def get_products_name(session: AsyncSession, name: str, page: int) -> tuple[list, bool]:
-    offset = page * 5
+
+async def get_products_name(session: AsyncSession, name: str,
+                            cursor: Optional[dict] = None) -> tuple[list, Optional[dict]]:
     update_date = date.today()
 
-    if name.lower() == 'найти все':
+    name = " ".join(name.lower().split())
+    if name == 'найти все':
         name = 'нер'
 
-    query = (
-        select(Products)
-        .where(
-            Products.name.ilike(f"%{name}%"),
-            Products.update_date == update_date
+    key = _cache_key('name', name, cursor)
+    if (cached := query_cache.get(key)) is not None:
+        return cached
+
+    if snapshot := catalog.today():
+        source = f'snapshot:{snapshot.update_date}'
+        rows = snapshot.by_name(name, after=_cursor_key(cursor, source), limit=PAGE_SIZE + 1)
+    else:
+        source = 'db'
+        query = (
+            search_products(session.bind.dialect.name, name, after=_cursor_key(cursor, source))
+            .join(Shop, Shop.id == Product.shop_id)
+            .add_columns(Shop.name)
+            .where(Product.update_date == update_date)
+            .limit(PAGE_SIZE + 1)
         )
-        .offset(offset)
-        .limit(6)
-    )
+        result = await session.execute(query)
+        rows = [((rank, product.id), CatalogItem(product.id, product.name, product.cost, shop))
+                for product, rank, shop in result.all()]
 
-    result = await session.scalars(query)
-    elements = result.all()
-    return elements[:5], len(elements) > 5
+    page = _keyset_page(rows, source)
+    query_cache.put(key, page)
+    return page
 
 
-async def get_products_cost(session: AsyncSession, cost: int, page: int) -> tuple[list, bool]:
-    offset = page * 5
+async def get_products_cost(session: AsyncSession, cost: int,
+                            cursor: Optional[dict] = None) -> tuple[list, Optional[dict]]:
     update_date = date.today()
     low_cost = cost - 10
     high_cost = cost + 10
 
-    query = (
-        select(Products)
-        .filter(
-            Products.cost.between(low_cost, high_cost),
-            Products.update_date == update_date
-        )
-        .offset(offset)
-        .limit(6)
-    )
-
-    result = await session.scalars(query)
-    elements = result.all()
-    return elements[:5], len(elements) > 5
-
-
-async def get_plot_data(session: AsyncSession, name: str) -> tuple[list, list]:
+    key = _cache_key('cost', cost, cursor)
+    if (cached := query_cache.get(key)) is not None:
+        return cached
 
-    product = await session.scalar(select(Products)
-        .where(
-            Products.name.ilike(f"%{name}%")
+    if snapshot := catalog.today():
+        source = f'snapshot:{snapshot.update_date}'
+        rows = snapshot.by_cost(low_cost, high_cost, after=_cursor_key(cursor, source), limit=PAGE_SIZE + 1)
+    else:
+        source = 'db'
+        query = (
+            select(Product.id, Product.name, Product.cost, Shop.name)
+            .join(Shop, Shop.id == Product.shop_id)
+            .filter(
+                Product.cost.between(low_cost, high_cost),
+                Product.update_date == update_date
+            )
+            .order_by(Product.cost, Product.id)
+            .limit(PAGE_SIZE + 1)
         )
+        if after := _cursor_key(cursor, source):
+            last_cost, last_id = after
+            query = query.filter(or_(
+                Product.cost > last_cost,
+                and_(Product.cost == last_cost, Product.id > last_id)
+            ))
+        result = await session.execute(query)
+        rows = [((row.cost, row.id), CatalogItem(*row)) for row in result.all()]
+
+    page = _keyset_page(rows, source)
+    query_cache.put(key, page)
+    return page
+
+
+# one statement: the best name match picks (shop_id, identity_id), its change-only intervals
+# and any daily rows are read through the (shop_id, identity_id, ...) indexes as plain tuples
+async def get_plot_data(session: AsyncSession, name: str) -> tuple[list, list, str, Optional[int]]:
+    match = search_products(session.bind.dialect.name, name).limit(1).subquery()
+
+    intervals = (
+        select(PriceInterval.valid_from, PriceInterval.valid_to, PriceInterval.cost,
+               literal(0).label('source'), match.c.name, match.c.shop_id)
+        .join(match, and_(PriceInterval.shop_id == match.c.shop_id,
+                          PriceInterval.identity_id == match.c.identity_id))
     )
+    daily = (
+        select(Product.update_date, Product.update_date, Product.cost,
+               literal(1).label('source'), match.c.name, match.c.shop_id)
+        .join(match, and_(Product.shop_id == match.c.shop_id, Product.identity_id == match.c.identity_id))
+    )
+    result = await session.execute(union_all(intervals, daily).order_by('source'))
+    rows = result.all()
+    if not rows:
+        return [], [], name, None
 
-    result = await session.scalars(select(Products)
-        .where(
-            Products.name.ilike(f"%{product.name}%"),
-            Products.shop == f'{product.shop}'
-        )
-        .order_by(Products.update_date.asc()))
-
-    elements = result.all()
-
-    dates = [elem.update_date for elem in elements]
-    costs = [elem.cost for elem in elements]
+    dates, costs = expand_series(rows)
 
-    return dates, costs, product.name
+    return dates, costs, rows[0].name, rows[0].shop_id
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
@@ -142,26 +189,145 @@ class States(StatesGroup):
     page = State()
     has_next = State()
 
-async def main_bot():
-    config = load_config(".env")
-    engine = create_async_engine(url='sqlite+aiosqlite:///db.enerkotik.sqlite3')
-    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+def build_storage(config: Config) -> BaseStorage:
+    if config.tg_bot.fsm_storage == 'sql':
+        return SQLStorage(get_session_pool())
+    if config.tg_bot.fsm_storage == 'memory':
+        return MemoryStorage()
+    raise ValueError("Invalid fsm_storage. Supported storages are 'memory' and 'sql'.")
+
+
+def build_dispatcher(config: Config) -> Dispatcher:
+    # admin_ids is workflow data, handlers and filters can ask for it by name
+    dp = Dispatcher(storage=build_storage(config), admin_ids=frozenset(config.tg_bot.admin_ids))
+    dp.update.middleware(DatabaseMiddleware(session_pool=get_session_pool()))
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(HandlerLatencyMiddleware())
+    dp.include_router(router)
+    return dp
 
+
+def build_bot(config: Config) -> Bot:
     bot = Bot(
         token=config.tg_bot.token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
+    bot.session.middleware(ApiLatencyMiddleware())
+    return bot
 
-    dp.update.middleware(DatabaseMiddleware(session_pool=session_factory))
 
-    dp.include_router(router)
+async def _load_catalog() -> None:
+    try:
+        await catalog.refresh(get_session_pool())
+    except Exception as e:
+        logger.error(f"Catalog snapshot load failed, serving from the database: {e}")
+
+
+# on_shutdown callbacks run before the engine is disposed, e.g. to stop background scrapes
+async def main_bot(on_shutdown: Sequence[Callable[[], Awaitable]] = ()):
+    config = load_config(".env")
+    if config.tg_bot.mode == 'webhook':
+        raise ValueError("Webhook mode runs in worker processes, use serve_webhook().")
+
+    bot = build_bot(config)
+    dp = build_dispatcher(config)
+    await _load_catalog()
+    metrics_runner = None
+    if config.tg_bot.metrics_port:
+        metrics_runner = await start_metrics_server(config.tg_bot.host, config.tg_bot.metrics_port)
+    # picks up scrapes from a separate scraper process; in-process refreshes leave the stamp unchanged
+    watcher = asyncio.create_task(catalog.watch(get_session_pool(), config.scrape.watch_interval))
 
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
+        # pending updates are kept, so a restart doesn't lose messages
+        await bot.delete_webhook(drop_pending_updates=False)
         await dp.start_polling(bot)
     finally:
-        await engine.dispose()
+        watcher.cancel()
+        for callback in on_shutdown:
+            await callback()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        chart_service.close()
+        await dp.storage.close()
+        await dispose_engine()
+
+
+async def run_webhook_worker(worker_index: int):
+    config = load_config(".env")
+    bot = build_bot(config)
+    dp = build_dispatcher(config)
+    await _load_catalog()
+
+    # only the first worker registers the webhook, the rest just serve it
+    if worker_index == 0:
+        await bot.set_webhook(
+            url=config.tg_bot.webhook_url + config.tg_bot.webhook_path,
+            secret_token=config.tg_bot.webhook_secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False
+        )
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.tg_bot.webhook_secret or None
+    ).register(app, path=config.tg_bot.webhook_path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    # several workers bind the same port and the kernel spreads connections between them;
+    # a single worker doesn't ask for SO_REUSEPORT, which some platforms don't have
+    reuse_port = config.tg_bot.workers > 1
+    site = web.TCPSite(runner, config.tg_bot.host, config.tg_bot.port, reuse_port=reuse_port or None)
+    await site.start()
+    logger.info(f"Webhook worker {worker_index} listening on {config.tg_bot.host}:{config.tg_bot.port}")
+    metrics_runner = None
+    if config.tg_bot.metrics_port:
+        metrics_runner = await start_metrics_server(config.tg_bot.host, config.tg_bot.metrics_port,
+                                                    reuse_port=reuse_port)
+    # scrapes run in the main process, workers pick up new data by watching the table
+    watcher = asyncio.create_task(catalog.watch(get_session_pool(), config.scrape.watch_interval))
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        watcher.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await runner.cleanup()
+        chart_service.close()
+        await dispose_engine()
+
+
+def _webhook_worker(worker_index: int):
+    asyncio.run(run_webhook_worker(worker_index))
+
+
+def serve_webhook():
+    config = load_config(".env")
+    if config.tg_bot.fsm_storage != 'sql' and config.tg_bot.workers > 1:
+        raise ValueError("Several webhook workers need the shared 'sql' FSM storage.")
+
+    # spawn, not fork: workers must not inherit the parent's event loop and connections
+    context = multiprocessing.get_context('spawn')
+    workers = [
+        context.Process(target=_webhook_worker, args=(index,), name=f"webhook-{index}")
+        for index in range(config.tg_bot.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+# emoji carries a large name table, it is loaded with the first keyboard instead of at startup
+@lru_cache(maxsize=None)
+def _emojize(alias: str) -> str:
+    import emoji
+    return emoji.emojize(alias)
 
 
 def create_main_keyboard():
@@ -181,12 +347,12 @@ async def build_pagination_keyboard_name(current_page: int, has_next: bool) -> I
     builder = InlineKeyboardBuilder()
     if current_page > 0:
         builder.button(
-            text=emoji.emojize(":left_arrow:"),
+            text=_emojize(":left_arrow:"),
             callback_data="back_name"
         )
     if has_next:
         builder.button(
-            text=emoji.emojize(":right_arrow:"),
+            text=_emojize(":right_arrow:"),
             callback_data="next_name"
         )
     builder.adjust(3 if has_next and current_page > 0 else 2)
@@ -198,12 +364,12 @@ async def build_pagination_keyboard_cost(current_page: int, has_next: bool) -> I
     builder = InlineKeyboardBuilder()
     if current_page > 0:
         builder.button(
-            text=emoji.emojize(":left_arrow:"),
+            text=_emojize(":left_arrow:"),
             callback_data="back_cost"
         )
     if has_next:
         builder.button(
-            text=emoji.emojize(":right_arrow:"),
+            text=_emojize(":right_arrow:"),
             callback_data="next_cost"
         )
     builder.adjust(3 if has_next and current_page > 0 else 2)
@@ -231,10 +397,10 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
 
     answer = f'Привет, <b> {message.from_user.full_name} </b>, я твой личный котенок для поиска прокдутов из магазина, подскажу цену, ее динамику, где этот товар найти и актуальные скидки'
 
-    user = await session.scalar(select(Users).filter_by(tg_id=message.from_user.id))
+    user = await session.scalar(select(User).filter_by(tg_id=message.from_user.id))
     if not user:
         try:
-            new_user = Users(tg_id=message.from_user.id, name=message.from_user.full_name)
+            new_user = User(tg_id=message.from_user.id, name=message.from_user.full_name)
             session.add(new_user)
             await message.answer(answer, reply_markup=create_main_keyboard())
         except Exception as e:
@@ -244,6 +410,15 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
         await message.answer(answer, reply_markup=create_main_keyboard())
 
 
+def is_admin(message: Message, admin_ids: frozenset[int]) -> bool:
+    return message.from_user is not None and message.from_user.id in admin_ids
+
+
+@router.message(Command('stats'), is_admin)
+async def cmd_stats(message: Message):
+    await message.answer(format_stats())
+
+
 @router.message(F.text == 'Назад')
 async def cmd_back(message: Message, state: FSMContext, session: AsyncSession):
     await cmd_start(message, state, session)
@@ -269,16 +444,16 @@ async def cmd_find_name(message: Message, state: FSMContext, session: AsyncSessi
 @router.message(States.name)
 async def process_name(message: Message, state: FSMContext, session: AsyncSession):
     try:
-        await state.update_data(name=message.text.strip(), page=0)
+        await state.update_data(name=message.text.strip(), page=0, cursors=[None])
         data = await state.get_data()
 
-        elements, has_next = await get_products_name(
+        elements, next_cursor = await get_products_name(
             session=session,
-            name=data['name'],
-            page=data['page']
+            name=data['name']
         )
 
-        await state.update_data(has_next=has_next)
+        has_next = next_cursor is not None
+        await state.update_data(has_next=has_next, next_cursor=next_cursor)
         builder = await build_pagination_keyboard_name(data['page'], has_next)
 
         await message.answer(
@@ -297,17 +472,23 @@ async def handle_pagination_name(callback: CallbackQuery, state: FSMContext, ses
         await callback.answer()
         data = await state.get_data()
 
-        page = data.get('page', 0)
-        new_page = page + 1 if callback.data == 'next_name' else max(0, page - 1)
+        # cursors[i] is the keyset cursor page i was fetched with
+        cursors = data.get('cursors', [None])
+        if callback.data == 'next_name' and data.get('next_cursor'):
+            cursors = cursors + [data['next_cursor']]
+        elif callback.data == 'back_name' and len(cursors) > 1:
+            cursors = cursors[:-1]
+        new_page = len(cursors) - 1
 
-        elements, has_next = await get_products_name(
+        elements, next_cursor = await get_products_name(
             session=session,
             name=data['name'],
-            page=new_page
+            cursor=cursors[-1]
         )
 
-        await state.update_data(page=new_page, has_next=has_next)
-        builder = await build_pagination_keyboard_name(data['page'], has_next)
+        has_next = next_cursor is not None
+        await state.update_data(page=new_page, cursors=cursors, next_cursor=next_cursor, has_next=has_next)
+        builder = await build_pagination_keyboard_name(new_page, has_next)
 
         await callback.message.edit_text(
             text=format_answer(elements, new_page),
@@ -335,16 +516,16 @@ async def cmd_find_cost(message: Message, state: FSMContext, session: AsyncSessi
 @router.message(States.cost)
 async def process_cost(message: Message, state: FSMContext, session: AsyncSession):
     try:
-        await state.update_data(cost=message.text.strip(), page=0)
+        await state.update_data(cost=message.text.strip(), page=0, cursors=[None])
         data = await state.get_data()
 
-        elements, has_next = await get_products_cost(
+        elements, next_cursor = await get_products_cost(
             session=session,
-            cost=int(data['cost']),
-            page=data['page']
+            cost=int(data['cost'])
         )
 
-        await state.update_data(has_next=has_next)
+        has_next = next_cursor is not None
+        await state.update_data(has_next=has_next, next_cursor=next_cursor)
         builder = await build_pagination_keyboard_cost(data['page'], has_next)
 
         await message.answer(
@@ -363,17 +544,23 @@ async def handle_pagination_cost(callback: CallbackQuery, state: FSMContext, ses
         await callback.answer()
         data = await state.get_data()\
 
-        page = data.get('page', 0)
-        new_page = page + 1 if callback.data == 'next_cost' else max(0, page - 1)
+        # cursors[i] is the keyset cursor page i was fetched with
+        cursors = data.get('cursors', [None])
+        if callback.data == 'next_cost' and data.get('next_cursor'):
+            cursors = cursors + [data['next_cursor']]
+        elif callback.data == 'back_cost' and len(cursors) > 1:
+            cursors = cursors[:-1]
+        new_page = len(cursors) - 1
 
-        elements, has_next = await get_products_cost(
+        elements, next_cursor = await get_products_cost(
             session=session,
             cost=int(data['cost']),
-            page=new_page
+            cursor=cursors[-1]
         )
 
-        await state.update_data(page=new_page, has_next=has_next)
-        builder = await build_pagination_keyboard_cost(data['page'], has_next)
+        has_next = next_cursor is not None
+        await state.update_data(page=new_page, cursors=cursors, next_cursor=next_cursor, has_next=has_next)
+        builder = await build_pagination_keyboard_cost(new_page, has_next)
 
         await callback.message.edit_text(
             text=format_answer(elements, new_page),
@@ -414,7 +601,7 @@ async def handle_plot_request(message: types.Message,
         await state.update_data(plot_name=user_input)
         data = await state.get_data()
 
-        dates, costs, product_name = await get_plot_data(
+        dates, costs, product_name, shop_id = await get_plot_data(
             session=session,
             name=data['plot_name']
         )
@@ -423,7 +610,7 @@ async def handle_plot_request(message: types.Message,
             await message.answer("📊 Недостаточно данных для построения графика")
             return
 
-        photo = await create_plot(dates, costs)
+        photo = await create_plot(dates, costs, key=(product_name, shop_id, dates[-1]))
         await message.answer_photo(
             photo=photo,
             caption=f"График цен для: {product_name}"
@@ -432,3 +619,51 @@ async def handle_plot_request(message: types.Message,
     except Exception as e:
         logger.error(f"Plot error: {str(e)}", exc_info=True)
         await message.answer("🚨 Произошла ошибка при генерации графика")
+
+
+INLINE_LIMIT = 20
+INLINE_CACHE_TIME = 300
+
+
+def _inline_article(item_id: int, name: str, cost: int, shop: Optional[str]) -> InlineQueryResultArticle:
+    # the message is sent with the bot's default HTML parse mode, product names may carry & and <
+    line = f"• {html.escape(name)} - {cost} руб." + (f" ({html.escape(shop)})" if shop else "")
+    return InlineQueryResultArticle(
+        id=str(item_id),
+        title=name,
+        description=f"{cost} руб." + (f" • {shop}" if shop else ""),
+        input_message_content=InputTextMessageContent(message_text=line)
+    )
+
+
+async def get_inline_results(session: AsyncSession, query: str) -> list[InlineQueryResultArticle]:
+    query = " ".join(query.lower().split())
+    if not query:
+        return []
+
+    if snapshot := catalog.today():
+        key = (catalog.version, query)
+        if (results := inline_cache.get(key)) is not None:
+            return results
+
+        results = [_inline_article(item.id, item.name, item.cost, item.shop)
+                   for item in snapshot.complete(query, limit=INLINE_LIMIT)]
+        inline_cache.put(key, results)
+        return results
+
+    result = await session.execute(
+        search_products(session.bind.dialect.name, query)
+        .where(Product.update_date == date.today())
+        .limit(INLINE_LIMIT)
+    )
+    return [_inline_article(product.id, product.name, product.cost, None) for product, _ in result.all()]
+
+
+@router.inline_query()
+async def handle_inline_query(inline_query: InlineQuery, session: AsyncSession):
+    try:
+        results = await get_inline_results(session, inline_query.query)
+        await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False)
+    except Exception as e:
+        logger.error(f"Inline query error: {e}")
+        await inline_query.answer([], cache_time=1)